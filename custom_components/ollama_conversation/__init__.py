@@ -1,20 +1,31 @@
 """The Ollama Conversation integration."""
+import asyncio
 import logging
-from typing import Literal
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable, Sequence
+from typing import Any, Literal
 
 import aiohttp
-import async_timeout
+import orjson
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_URL, Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.const import CONF_URL, EVENT_HOMEASSISTANT_CLOSE, Platform
+from homeassistant.core import Event, HomeAssistant
 from homeassistant.exceptions import ConfigEntryNotReady
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
 from .const import (
+    API_CHAT,
     API_TAGS,
+    CHAT_TOKENS_PER_SECOND,
+    CONF_CONTEXT_WINDOW,
     CONF_MODEL,
+    DEFAULT_CONTEXT_WINDOW,
+    DEFAULT_TEMPERATURE,
     DOMAIN,
+    JSON_EXECUTOR_THRESHOLD,
+    MESSAGE_CACHE_SIZE,
+    TIMEOUT_CHAT,
+    TIMEOUT_CHAT_MIN,
     TIMEOUT_LIST_MODELS,
 )
 
@@ -28,15 +39,27 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     url = entry.data[CONF_URL]
     
     # Validate connection
-    client = OllamaClient(hass, url)
+    client = OllamaClient(
+        hass, url, entry.data.get(CONF_CONTEXT_WINDOW, DEFAULT_CONTEXT_WINDOW)
+    )
     try:
         await client.get_models()
     except Exception as err:
         _LOGGER.error("Failed to connect to Ollama server at %s: %s", url, err)
+        await client.close()
         raise ConfigEntryNotReady from err
 
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = client
 
+    # Config entries are not unloaded when Home Assistant stops, so the
+    # client's own session is closed with the event loop as well
+    async def _close_client(_event: Event) -> None:
+        await client.close()
+
+    entry.async_on_unload(
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _close_client)
+    )
+
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
@@ -44,28 +67,65 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data[DOMAIN].pop(entry.entry_id)
+        client = hass.data[DOMAIN].pop(entry.entry_id)
+        await client.close()
     return unload_ok
 
 
 class OllamaClient:
     """Client for Ollama API."""
 
-    def __init__(self, hass: HomeAssistant, base_url: str) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        base_url: str,
+        context_window: int = DEFAULT_CONTEXT_WINDOW,
+    ) -> None:
         """Initialize the Ollama client."""
         self.hass = hass
         self.base_url = base_url.rstrip("/")
-        self.session = async_get_clientsession(hass)
+        self._tags_url = f"{self.base_url}{API_TAGS}"
+        self._chat_url = f"{self.base_url}{API_CHAT}"
+        # Larger context windows take longer to process, so scale the timeout.
+        # It covers model load, prefill and the whole streamed reply, so it
+        # never drops below the fixed limit slow (e.g. CPU-only) servers need.
+        self.chat_timeout = max(
+            TIMEOUT_CHAT_MIN, TIMEOUT_CHAT + context_window / CHAT_TOKENS_PER_SECOND
+        )
+        # Timeouts are handled by aiohttp itself; build the objects once
+        self._chat_timeout = aiohttp.ClientTimeout(
+            total=self.chat_timeout, connect=TIMEOUT_LIST_MODELS
+        )
+        self._models_timeout = aiohttp.ClientTimeout(total=TIMEOUT_LIST_MODELS)
+        # Dedicated session so connections to the Ollama host stay warm
+        # between requests instead of competing in HA's shared pool
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=8,
+                limit_per_host=4,
+                keepalive_timeout=120,
+                ttl_dns_cache=300,
+            ),
+        )
+        # Encoded JSON of the last tools list seen, reused while the caller
+        # keeps passing the same (static) list object
+        self._tools_cache: tuple[Sequence[dict], bytes] | None = None
+        # id(message) -> (message, encoded JSON), least recently used first.
+        # The message is kept referenced so its id cannot be reused.
+        self._message_cache: OrderedDict[int, tuple[dict, bytes]] = OrderedDict()
+
+    async def close(self) -> None:
+        """Close the underlying HTTP session."""
+        await self.session.close()
 
     async def get_models(self) -> list[dict]:
         """Get available models from Ollama."""
-        url = f"{self.base_url}{API_TAGS}"
+        url = self._tags_url
         
         try:
-            async with async_timeout.timeout(TIMEOUT_LIST_MODELS):
-                response = await self.session.get(url)
+            async with self.session.get(url, timeout=self._models_timeout) as response:
                 response.raise_for_status()
-                data = await response.json()
+                data = await self._loads(await response.read())
                 return data.get("models", [])
         except aiohttp.ClientError as err:
             _LOGGER.error("Error fetching models from %s: %s", url, err)
@@ -74,63 +134,228 @@ class OllamaClient:
             _LOGGER.error("Timeout fetching models from %s", url)
             raise
 
-    async def chat(
+    async def _loads(self, raw: bytes) -> Any:
+        """Decode a JSON body, moving large ones off the event loop."""
+        if len(raw) > JSON_EXECUTOR_THRESHOLD:
+            return await self.hass.async_add_executor_job(orjson.loads, raw)
+        return orjson.loads(raw)
+
+    def _encode_message(self, message: dict) -> bytes:
+        """Return the JSON encoding of a message, cached by object identity.
+        
+        History messages are replayed on every turn but never modified, so
+        their encoding is kept for the most recently used messages.
+        """
+        cache = self._message_cache
+        key = id(message)
+        cached = cache.get(key)
+        if cached is not None and cached[0] is message:
+            cache.move_to_end(key)
+            return cached[1]
+        encoded = orjson.dumps(message)
+        cache[key] = (message, encoded)
+        if len(cache) > MESSAGE_CACHE_SIZE:
+            cache.popitem(last=False)
+        return encoded
+
+    def _encode_tools(self, tools: Sequence[dict]) -> bytes:
+        """Return the JSON encoding of tools, cached by object identity."""
+        cached = self._tools_cache
+        if cached is not None and cached[0] is tools:
+            return cached[1]
+        encoded = orjson.dumps(tools)
+        self._tools_cache = (tools, encoded)
+        return encoded
+
+    def _build_chat_body(
         self,
         messages: list[dict],
         model: str,
-        tools: list[dict] | None = None,
-        temperature: float = 0.7,
-        stream: bool = False,
-    ) -> dict:
-        """Send chat request to Ollama."""
-        url = f"{self.base_url}/api/chat"
-        
+        tools: Sequence[dict] | None,
+        temperature: float,
+        stream: bool,
+    ) -> bytes:
+        """Encode a chat request body."""
         payload = {
             "model": model,
-            "messages": messages,
             "stream": stream,
             "options": {
                 "temperature": temperature,
             }
         }
         
+        # Splice the pre-encoded messages and tool schema into the object
+        body = (
+            orjson.dumps(payload)[:-1]
+            + b',"messages":['
+            + b",".join(self._encode_message(message) for message in messages)
+            + b"]"
+        )
         if tools:
-            payload["tools"] = tools
+            body += b',"tools":' + self._encode_tools(tools)
+        body += b"}"
         
-        _LOGGER.debug("Sending chat request to %s with model %s", url, model)
-        _LOGGER.debug("Messages: %s", messages)
-        _LOGGER.debug("Tools: %s", tools is not None and len(tools) if tools else 0)
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Sending chat request to %s with model %s", self._chat_url, model)
+            _LOGGER.debug("Messages: %s", messages)
+            _LOGGER.debug("Tools: %s", len(tools) if tools else 0)
+        return body
+
+    def _client_timeout(self, timeout: float | None) -> tuple[float, aiohttp.ClientTimeout]:
+        """Return the timeout in seconds and as an aiohttp ClientTimeout."""
+        if timeout is None:
+            return self.chat_timeout, self._chat_timeout
+        return timeout, aiohttp.ClientTimeout(total=timeout, connect=TIMEOUT_LIST_MODELS)
+
+    async def _post_chat(
+        self, body: bytes, client_timeout: aiohttp.ClientTimeout
+    ) -> aiohttp.ClientResponse:
+        """POST a chat request and raise if Ollama returns an error status."""
+        response = await self.session.post(
+            self._chat_url,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            timeout=client_timeout,
+        )
+        _LOGGER.debug("Response status: %s", response.status)
         
+        if response.status != 200:
+            # Only read the raw body when we need it for error context
+            response_text = await response.text()
+            _LOGGER.error("Ollama API error: %s - %s", response.status, response_text)
+            raise aiohttp.ClientResponseError(
+                request_info=response.request_info,
+                history=response.history,
+                status=response.status,
+                message=f"Ollama API returned {response.status}: {response_text[:200]}",
+                headers=response.headers,
+            )
+        return response
+
+    async def chat(
+        self,
+        messages: list[dict],
+        model: str,
+        tools: Sequence[dict] | None = None,
+        temperature: float = DEFAULT_TEMPERATURE,
+        stream: bool = False,
+        timeout: float | None = None,
+        on_chunk: Callable[[dict], None] | None = None,
+    ) -> dict:
+        """Send chat request to Ollama.
+        
+        With stream=True the response is read incrementally via chat_stream
+        and assembled into the same shape as a non-streamed response.
+        on_chunk, if given, is called with each chunk as it arrives.
+        
+        If the request is cancelled or times out, the connection is closed
+        rather than returned to the pool so Ollama stops generating.
+        """
+        if stream:
+            return await self._collect_stream(
+                self.chat_stream(messages, model, tools, temperature, timeout),
+                on_chunk,
+            )
+
+        timeout, client_timeout = self._client_timeout(timeout)
+        body = self._build_chat_body(messages, model, tools, temperature, False)
+        
+        response = None
         try:
-            async with async_timeout.timeout(120):  # Increased timeout for tool calls
-                response = await self.session.post(url, json=payload)
-                
-                # Log the response status and content for debugging
-                response_text = await response.text()
-                _LOGGER.debug("Response status: %s", response.status)
-                _LOGGER.debug("Response body: %s", response_text[:500])  # First 500 chars
+            response = await self._post_chat(body, client_timeout)
+            
+            # Parse the body in a single pass
+            try:
+                data = await self._loads(await response.read())
+            except orjson.JSONDecodeError as json_err:
+                _LOGGER.error("Failed to parse JSON response: %s", json_err)
+                raise
+            
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Response body: %s", str(data)[:500])  # First 500 chars
+            return data
                 
-                if response.status != 200:
-                    _LOGGER.error("Ollama API error: %s - %s", response.status, response_text)
-                    raise aiohttp.ClientResponseError(
-                        request_info=response.request_info,
-                        history=response.history,
-                        status=response.status,
-                        message=f"Ollama API returned {response.status}: {response_text[:200]}",
-                        headers=response.headers,
-                    )
+        except aiohttp.ClientError as err:
+            _LOGGER.error("Error in chat request: %s", err)
+            raise
+        except TimeoutError:
+            _LOGGER.error("Timeout in chat request after %.0fs", timeout)
+            if response is not None:
+                response.close()
+            raise
+        except asyncio.CancelledError:
+            # Drop the connection so the server sees the client is gone
+            if response is not None:
+                response.close()
+            raise
+
+    async def chat_stream(
+        self,
+        messages: list[dict],
+        model: str,
+        tools: Sequence[dict] | None = None,
+        temperature: float = DEFAULT_TEMPERATURE,
+        timeout: float | None = None,
+    ) -> AsyncIterator[dict]:
+        """Stream a chat response from Ollama.
+        
+        Yields each NDJSON chunk as soon as it arrives. Every chunk carries a
+        partial "message" whose "content" is the next text delta; the last
+        chunk has "done" set and includes the timing statistics.
+        """
+        timeout, client_timeout = self._client_timeout(timeout)
+        body = self._build_chat_body(messages, model, tools, temperature, True)
+        
+        response = None
+        done = False
+        try:
+            response = await self._post_chat(body, client_timeout)
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                chunk = orjson.loads(line)
+                if error := chunk.get("error"):
+                    _LOGGER.error("Ollama stream error: %s", error)
+                    raise aiohttp.ClientPayloadError(f"Ollama stream error: {error}")
+                done = chunk.get("done", False)
+                yield chunk
+                if done:
+                    break
                 
-                # Parse JSON from the response text
-                try:
-                    return await response.json()
-                except Exception as json_err:
-                    _LOGGER.error("Failed to parse JSON response: %s", json_err)
-                    _LOGGER.error("Response text: %s", response_text)
-                    raise
-                    
         except aiohttp.ClientError as err:
             _LOGGER.error("Error in chat request: %s", err)
             raise
-        except TimeoutError as err:
-            _LOGGER.error("Timeout in chat request after 60s")
+        except TimeoutError:
+            _LOGGER.error("Timeout in chat request after %.0fs", timeout)
             raise
+        finally:
+            if response is not None:
+                if done:
+                    response.release()
+                else:
+                    # Abandoned, cancelled or failed mid-stream: drop the
+                    # connection so the server stops generating
+                    response.close()
+
+    @staticmethod
+    async def _collect_stream(
+        chunks: AsyncIterator[dict],
+        on_chunk: Callable[[dict], None] | None = None,
+    ) -> dict:
+        """Assemble streamed chunks into a single chat response."""
+        message: dict[str, Any] = {"role": "assistant"}
+        content: list[str] = []
+        final: dict = {}
+        async for chunk in chunks:
+            if on_chunk is not None:
+                on_chunk(chunk)
+            for key, value in (chunk.get("message") or {}).items():
+                if key == "content":
+                    content.append(value)
+                elif key == "tool_calls":
+                    message.setdefault("tool_calls", []).extend(value)
+                else:
+                    message[key] = value
+            final = chunk
+        message["content"] = "".join(content)
+        return {**final, "message": message}
@@ -3,6 +3,7 @@ import logging
 from typing import Any
 
 import aiohttp
+import orjson
 import voluptuous as vol
 
 from homeassistant import config_entries
@@ -14,21 +15,52 @@ from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from .const import (
     API_TAGS,
     CONF_CONTEXT_WINDOW,
+    CONF_ENTITY_MODE,
+    CONF_MAX_HISTORY,
     CONF_MODEL,
     CONF_TEMPERATURE,
     CONF_TOP_K,
     CONF_TOP_P,
     DEFAULT_CONTEXT_WINDOW,
+    DEFAULT_ENTITY_MODE,
     DEFAULT_TEMPERATURE,
     DEFAULT_TOP_K,
     DEFAULT_TOP_P,
     DEFAULT_URL,
     DOMAIN,
+    ENTITY_MODE_INLINE,
+    ENTITY_MODE_TOOL,
+    MAX_HISTORY,
     TIMEOUT_LIST_MODELS,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+_USER_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_URL, default=DEFAULT_URL): str,
+    }
+)
+
+# Model parameters; the model selector itself depends on the server and is
+# added per flow in async_step_model
+_MODEL_SCHEMA_BASE = {
+    vol.Optional(CONF_TEMPERATURE, default=DEFAULT_TEMPERATURE): vol.All(
+        vol.Coerce(float), vol.Range(min=0.0, max=2.0)
+    ),
+    vol.Optional(CONF_CONTEXT_WINDOW, default=DEFAULT_CONTEXT_WINDOW): vol.Coerce(int),
+    vol.Optional(CONF_TOP_P, default=DEFAULT_TOP_P): vol.All(
+        vol.Coerce(float), vol.Range(min=0.0, max=1.0)
+    ),
+    vol.Optional(CONF_TOP_K, default=DEFAULT_TOP_K): vol.Coerce(int),
+    vol.Optional(CONF_MAX_HISTORY, default=MAX_HISTORY): vol.All(
+        vol.Coerce(int), vol.Range(min=2, max=50)
+    ),
+    vol.Optional(CONF_ENTITY_MODE, default=DEFAULT_ENTITY_MODE): vol.In(
+        [ENTITY_MODE_INLINE, ENTITY_MODE_TOOL]
+    ),
+}
+
 
 async def validate_connection(hass: HomeAssistant, url: str) -> list[str]:
     """Validate the connection and return available models."""
@@ -38,7 +70,7 @@ async def validate_connection(hass: HomeAssistant, url: str) -> list[str]:
     try:
         async with session.get(api_url, timeout=aiohttp.ClientTimeout(total=TIMEOUT_LIST_MODELS)) as response:
             response.raise_for_status()
-            data = await response.json()
+            data = orjson.loads(await response.read())
             models = [model["name"] for model in data.get("models", [])]
             if not models:
                 raise ValueError("No models found")
@@ -83,11 +115,7 @@ class OllamaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         return self.async_show_form(
             step_id="user",
-            data_schema=vol.Schema(
-                {
-                    vol.Required(CONF_URL, default=DEFAULT_URL): str,
-                }
-            ),
+            data_schema=_USER_SCHEMA,
             errors=errors,
         )
 
@@ -105,6 +133,8 @@ class OllamaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     CONF_CONTEXT_WINDOW: user_input.get(CONF_CONTEXT_WINDOW, DEFAULT_CONTEXT_WINDOW),
                     CONF_TOP_P: user_input.get(CONF_TOP_P, DEFAULT_TOP_P),
                     CONF_TOP_K: user_input.get(CONF_TOP_K, DEFAULT_TOP_K),
+                    CONF_MAX_HISTORY: user_input.get(CONF_MAX_HISTORY, MAX_HISTORY),
+                    CONF_ENTITY_MODE: user_input.get(CONF_ENTITY_MODE, DEFAULT_ENTITY_MODE),
                 },
             )
 
@@ -113,14 +143,7 @@ class OllamaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             data_schema=vol.Schema(
                 {
                     vol.Required(CONF_MODEL): vol.In(self.models),
-                    vol.Optional(CONF_TEMPERATURE, default=DEFAULT_TEMPERATURE): vol.All(
-                        vol.Coerce(float), vol.Range(min=0.0, max=2.0)
-                    ),
-                    vol.Optional(CONF_CONTEXT_WINDOW, default=DEFAULT_CONTEXT_WINDOW): vol.Coerce(int),
-                    vol.Optional(CONF_TOP_P, default=DEFAULT_TOP_P): vol.All(
-                        vol.Coerce(float), vol.Range(min=0.0, max=1.0)
-                    ),
-                    vol.Optional(CONF_TOP_K, default=DEFAULT_TOP_K): vol.Coerce(int),
+                    **_MODEL_SCHEMA_BASE,
                 }
             ),
         )
@@ -9,6 +9,8 @@ CONF_TEMPERATURE = "temperature"
 CONF_CONTEXT_WINDOW = "context_window"
 CONF_TOP_P = "top_p"
 CONF_TOP_K = "top_k"
+CONF_MAX_HISTORY = "max_history"
+CONF_ENTITY_MODE = "entity_mode"
 
 # Defaults
 DEFAULT_URL = "http://yourserverhere:11434"
@@ -17,11 +19,33 @@ DEFAULT_CONTEXT_WINDOW = 8192
 DEFAULT_TOP_P = 0.9
 DEFAULT_TOP_K = 40
 
+# How exposed devices reach the model: listed in the system prompt, or
+# looked up through a tool so the prompt stays identical between turns
+ENTITY_MODE_INLINE = "inline"
+ENTITY_MODE_TOOL = "tool"
+DEFAULT_ENTITY_MODE = ENTITY_MODE_INLINE
+
 # API Endpoints
 API_CHAT = "/api/chat"
 API_TAGS = "/api/tags"
 API_GENERATE = "/api/generate"
 
 # Timeouts
-TIMEOUT_CHAT = 30
+TIMEOUT_CHAT_MIN = 120  # floor for a whole chat request, in seconds
+TIMEOUT_CHAT = 30  # base allowance for a chat request, in seconds
 TIMEOUT_LIST_MODELS = 5
+CHAT_TOKENS_PER_SECOND = 100  # prompt throughput used to extend the timeout for large windows
+
+# Caching
+MESSAGE_CACHE_SIZE = 256  # encoded chat messages kept for history replay
+RESPONSE_CACHE_SIZE = 256  # first-turn model replies kept per agent
+
+# Conversation history
+MAX_HISTORY = 10  # messages kept per conversation
+CHARS_PER_TOKEN = 4  # rough estimate used to fit history in the context window
+
+# Tool execution
+MAX_CONCURRENT_TOOL_CALLS = 8  # service calls in flight per agent
+
+# Response bodies larger than this (bytes) are JSON-decoded in the executor
+JSON_EXECUTOR_THRESHOLD = 32_768
@@ -1,29 +1,236 @@
 """Conversation support for Ollama."""
+import asyncio
+from collections import OrderedDict, deque
 import logging
 import re
-import json
 from typing import Any, Literal
-import json
+
+import orjson
 
 from homeassistant.components import conversation
 from homeassistant.components.conversation import ConversationEntity, ConversationInput, ConversationResult
+from homeassistant.components.homeassistant.exposed_entities import async_listen_entity_updates
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import MATCH_ALL
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers import intent
+from homeassistant.const import EVENT_STATE_CHANGED, MATCH_ALL
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import area_registry as ar, device_registry as dr, entity_registry as er, intent
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.util import ulid
 
 from .const import (
+    CHARS_PER_TOKEN,
     CONF_CONTEXT_WINDOW,
+    CONF_ENTITY_MODE,
+    CONF_MAX_HISTORY,
     CONF_MODEL,
     CONF_TEMPERATURE,
+    DEFAULT_CONTEXT_WINDOW,
+    DEFAULT_ENTITY_MODE,
+    DEFAULT_TEMPERATURE,
     DOMAIN,
+    ENTITY_MODE_TOOL,
+    MAX_CONCURRENT_TOOL_CALLS,
+    MAX_HISTORY,
+    RESPONSE_CACHE_SIZE,
 )
 from .helpers import async_get_exposed_entities, format_entities_for_prompt
 
 _LOGGER = logging.getLogger(__name__)
 
+# hass.data key holding per-conversation message history
+_CONV_KEY = f"{DOMAIN}_conversations"
+
+
+# Tool schema exposed to the model. It never changes, so it is built once at
+# import time and the same object is handed to the client on every turn.
+_HA_TOOLS: tuple[dict, ...] = (
+    # Light control
+    {
+        "type": "function",
+        "function": {
+            "name": "light_turn_on",
+            "description": "Turn on a light or adjust its brightness",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "entity_id": {
+                        "type": "string",
+                        "description": "The entity ID of the light (e.g., light.living_room)"
+                    },
+                    "brightness": {
+                        "type": "integer",
+                        "description": "Brightness level (0-255)",
+                        "minimum": 0,
+                        "maximum": 255
+                    }
+                },
+                "required": ["entity_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "light_turn_off",
+            "description": "Turn off a light",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "entity_id": {
+                        "type": "string",
+                        "description": "The entity ID of the light"
+                    }
+                },
+                "required": ["entity_id"]
+            }
+        }
+    },
+    # Climate control
+    {
+        "type": "function",
+        "function": {
+            "name": "climate_set_temperature",
+            "description": "Set the temperature for a climate device",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "entity_id": {
+                        "type": "string",
+                        "description": "The entity ID of the climate device"
+                    },
+                    "temperature": {
+                        "type": "number",
+                        "description": "Target temperature"
+                    }
+                },
+                "required": ["entity_id", "temperature"]
+            }
+        }
+    },
+)
+
+
+# Device lookup offered in tool mode instead of listing devices in the prompt.
+# It is answered by the agent itself rather than through a service call.
+_ENTITY_LOOKUP_TOOL = "get_exposed_entities"
+_HA_TOOLS_WITH_LOOKUP: tuple[dict, ...] = (
+    *_HA_TOOLS,
+    {
+        "type": "function",
+        "function": {
+            "name": _ENTITY_LOOKUP_TOOL,
+            "description": "List the exposed devices with their entity IDs, areas and current states",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "domain": {
+                        "type": "string",
+                        "description": "Only list devices of this domain (e.g., light, climate)"
+                    }
+                }
+            }
+        }
+    },
+)
+
+
+# Tool name -> (domain, service, required args, optional args, result format).
+# Only the listed arguments are forwarded to the service call.
+_TOOL_DISPATCH: dict[str, tuple[str, str, tuple[str, ...], tuple[str, ...], str]] = {
+    "light_turn_on": (
+        "light", "turn_on", ("entity_id",), ("brightness",),
+        "Successfully turned on {entity_id}",
+    ),
+    "light_turn_off": (
+        "light", "turn_off", ("entity_id",), (),
+        "Successfully turned off {entity_id}",
+    ),
+    "climate_set_temperature": (
+        "climate", "set_temperature", ("entity_id", "temperature"), (),
+        "Successfully set {entity_id} to {temperature}°",
+    ),
+}
+
+# Suffix appended to the result message when an optional argument is used
+_OPTIONAL_RESULT_FMT = {
+    "brightness": " to {brightness} brightness",
+}
+
+# Tool name -> confirmation used when the model gives no final reply
+_SUMMARY_FMT = {
+    "light_turn_on": "turned on {entity_id}",
+    "light_turn_off": "turned off {entity_id}",
+    "climate_set_temperature": "set {entity_id} to {temperature}°",
+}
+
+# System prompt; {entities} is replaced with the exposed device listing
+_SYSTEM_TEMPLATE = """You are a helpful Home Assistant assistant that can control smart home devices.
+
+{entities}
+
+**Your Capabilities:**
+You can interact with the devices listed above using these tools:
+- light_turn_on: Turn on a light or adjust brightness
+- light_turn_off: Turn off a light
+- climate_set_temperature: Set target temperature for climate devices
+
+**Important Instructions:**
+1. Always use the EXACT entity_id when calling tools (e.g., light.living_room, not "living room light")
+2. Entity IDs use the format: domain.device_name (e.g., light.kitchen, climate.bedroom)
+3. When the user refers to a device by name, find the matching entity_id from the list above
+4. If a device name is ambiguous or not found, ask the user for clarification
+5. Always confirm what action you're performing before executing
+6. After taking an action, provide a brief, natural confirmation to the user
+
+**Response Format:**
+- Do NOT use <think> tags or internal reasoning blocks in your responses
+- Provide clear, concise responses directly to the user
+- After executing a tool, simply confirm what was done (e.g., "I've turned off the desk lamp.")
+- Keep confirmations brief and natural
+
+**Example Interactions:**
+- User: "Turn on the kitchen light" → You use light_turn_on with entity_id "light.kitchen" → You respond: "I've turned on the kitchen light."
+- User: "Set the bedroom to 72 degrees" → You use climate_set_temperature with entity_id "climate.bedroom" and temperature 72 → You respond: "I've set the bedroom temperature to 72°."
+- User: "Turn off all lights" → You ask which lights since there are multiple, or turn off each one separately
+
+Now respond helpfully to the user's request."""
+
+# System prompt for tool mode; devices are looked up on demand, so it never changes
+_LOOKUP_SYSTEM_PROMPT = """You are a helpful Home Assistant assistant that can control smart home devices.
+
+**Your Capabilities:**
+You can look up and control the user's devices using these tools:
+- get_exposed_entities: List the available devices with their entity IDs, areas and current states (optionally only one domain, such as light or climate)
+- light_turn_on: Turn on a light or adjust brightness
+- light_turn_off: Turn off a light
+- climate_set_temperature: Set target temperature for climate devices
+
+**Important Instructions:**
+1. You do not know which devices exist until you ask: call get_exposed_entities FIRST whenever the user mentions a device or asks about its state
+2. Always use the EXACT entity_id returned by get_exposed_entities when calling tools (e.g., light.living_room, not "living room light")
+3. When the user refers to a device by name, find the matching entity_id in the lookup result
+4. If a device name is ambiguous or not found, ask the user for clarification
+5. Answer questions about device states from the lookup result rather than guessing
+6. After taking an action, provide a brief, natural confirmation to the user
+
+**Response Format:**
+- Do NOT use <think> tags or internal reasoning blocks in your responses
+- Provide clear, concise responses directly to the user
+- After executing a tool, simply confirm what was done (e.g., "I've turned off the desk lamp.")
+- Keep confirmations brief and natural
+
+**Example Interactions:**
+- User: "Turn on the kitchen light" → You call get_exposed_entities with domain "light", find "light.kitchen", then use light_turn_on with entity_id "light.kitchen" → You respond: "I've turned on the kitchen light."
+- User: "Is the bedroom warm?" → You call get_exposed_entities with domain "climate" → You answer from the state it returns
+
+Now respond helpfully to the user's request."""
+
+
+# Tags delimiting reasoning blocks emitted by thinking models
+_THINK_OPEN_RE = re.compile(r'<think>', re.IGNORECASE)
+_THINK_CLOSE_RE = re.compile(r'</think>', re.IGNORECASE)
+_BLANKLINE_RE = re.compile(r'\n\s*\n+')
+
 
 def _filter_think_blocks(text: str) -> str:
     """Remove <think>...</think> blocks from response text.
@@ -42,20 +249,30 @@ def _filter_think_blocks(text: str) -> str:
     
     original_text = text
     
-    # Pattern 1: Match complete <think>...</think> blocks (case-insensitive, with DOTALL flag)
-    pattern_complete = r'<think>.*?</think>'
-    text = re.sub(pattern_complete, '', text, flags=re.IGNORECASE | re.DOTALL)
+    # Walk the text once, keeping only the spans outside think blocks. An
+    # unclosed <think> hides everything up to the end of the string.
+    if (start := _THINK_OPEN_RE.search(text)) is not None:
+        kept = []
+        pos = 0
+        while start is not None:
+            kept.append(text[pos:start.start()])
+            end = _THINK_CLOSE_RE.search(text, start.end())
+            if end is None:
+                pos = len(text)
+                break
+            pos = end.end()
+            start = _THINK_OPEN_RE.search(text, pos)
+        kept.append(text[pos:])
+        text = ''.join(kept)
     
-    # Pattern 2: Match unclosed <think> blocks (everything from <think> to end of string)
-    pattern_unclosed = r'<think>.*$'
-    text = re.sub(pattern_unclosed, '', text, flags=re.IGNORECASE | re.DOTALL)
-    
-    # Clean up any excess whitespace left behind
-    text = re.sub(r'\n\s*\n+', '\n', text)
+    # Clean up any excess whitespace left behind; short spoken replies are
+    # usually a single line and need no regex pass
+    if '\n' in text:
+        text = _BLANKLINE_RE.sub('\n', text)
     text = text.strip()
     
-    # Log if we filtered something out
-    if text != original_text:
+    # Log if we filtered something out (comparing costs a pass over the text)
+    if _LOGGER.isEnabledFor(logging.DEBUG) and text != original_text:
         _LOGGER.debug(
             "Filtered think blocks from response. Original length: %d, Filtered length: %d",
             len(original_text), len(text)
@@ -67,11 +284,22 @@ def _filter_think_blocks(text: str) -> str:
     return text
 
 
+# Bare keys that mark a gemma3-tools action object
+_GEMMA3_ACTION_KEYS = frozenset({"on", "off", "brightness"})
+
+# gemma3-tools domain -> (tool for "on", tool for "off", temperature tool).
+# Domains with a temperature tool take numeric values instead of on/off.
+_GEMMA3_DOMAIN_OPS: dict[str, tuple[str | None, str | None, str | None]] = {
+    "light": ("light_turn_on", "light_turn_off", None),
+    "climate": (None, None, "climate_set_temperature"),
+}
+
+
 def _is_gemma3_tool_format(response: dict) -> bool:
     """Detect if response is in gemma3-tools format.
     
     Gemma3-tools format has:
-    - A "type" field indicating the domain
+    - A "type" field indicating a supported domain (light, climate)
     - Entity IDs as keys with action values
     - No "tool_calls" field
     
@@ -88,20 +316,16 @@ def _is_gemma3_tool_format(response: dict) -> bool:
     if "tool_calls" in response:
         return False
     
-    # Check for gemma3-tools format markers
-    has_type_field = "type" in response
-    
-    if not has_type_field:
-        return False
-    
-    # Should have type and other keys that look like entity_ids
-    type_val = response.get("type")
-    if not isinstance(type_val, str):
+    # Should have a string type naming a domain the parser handles...
+    domain = response.get("type")
+    if not isinstance(domain, str) or domain not in _GEMMA3_DOMAIN_OPS:
         return False
     
-    # Look for entity_id patterns (e.g., light.desk_lamp, climate.bedroom)
-    for key in response.keys():
-        if key != "type" and ("." in key or key in ["on", "off", "brightness"]):
+    # ...and other keys that look like entity_ids (e.g., light.desk_lamp)
+    for key in response:
+        if key == "type":
+            continue
+        if "." in key or key in _GEMMA3_ACTION_KEYS:
             return True
     
     return False
@@ -137,11 +361,18 @@ def _parse_gemma3_tool_format(response: dict, domain_map: dict = None) -> list:
     """
     tool_calls = []
     domain = response.get("type", "unknown")
+    ops = _GEMMA3_DOMAIN_OPS.get(domain)
+    if ops is None:
+        _LOGGER.warning("Unknown domain in gemma3 format: %s", domain)
+        return tool_calls
+    on_tool, off_tool, temperature_tool = ops
     
     for key, value in response.items():
         if key == "type":
             continue
         
+        tool_call = None
+        
         # Skip special keys
         if key in ["__reasoning__", "text"]:
             continue
@@ -149,36 +380,32 @@ def _parse_gemma3_tool_format(response: dict, domain_map: dict = None) -> list:
         # Parse entity ID and action
         entity_id = key if "." in key else f"{domain}.{key}"
         
-        # Handle different action formats
-        if isinstance(value, str):
-            # Simple string action (e.g., "on", "off")
-            action = value.lower()
-            
-            if domain == "light":
+        # Handle different action formats. Values come from JSON decoding,
+        # so they are exact builtins and an identity type check suffices.
+        value_type = type(value)
+        if value_type is str:
+            if temperature_tool is None:
+                # Simple string action (e.g., "on", "off")
+                action = value.lower()
                 if action == "on":
-                    tool_call = {
-                        "function": {
-                            "name": "light_turn_on",
-                            "arguments": {"entity_id": entity_id}
-                        }
-                    }
+                    name = on_tool
                 elif action == "off":
-                    tool_call = {
-                        "function": {
-                            "name": "light_turn_off",
-                            "arguments": {"entity_id": entity_id}
-                        }
-                    }
+                    name = off_tool
                 else:
                     continue
-                    
-            elif domain == "climate":
+                tool_call = {
+                    "function": {
+                        "name": name,
+                        "arguments": {"entity_id": entity_id}
+                    }
+                }
+            else:
                 # For climate, value should be a number (temperature)
                 try:
                     temp = float(value)
                     tool_call = {
                         "function": {
-                            "name": "climate_set_temperature",
+                            "name": temperature_tool,
                             "arguments": {"entity_id": entity_id, "temperature": temp}
                         }
                     }
@@ -188,43 +415,36 @@ def _parse_gemma3_tool_format(response: dict, domain_map: dict = None) -> list:
                         entity_id, value
                     )
                     continue
-            else:
-                _LOGGER.warning("Unknown domain in gemma3 format: %s", domain)
-                continue
                 
-        elif isinstance(value, dict):
+        elif value_type is dict:
             # Complex action with parameters (e.g., {"brightness": 200})
-            if domain == "light":
-                # Assume it's a light_turn_on with brightness
+            if temperature_tool is None:
+                # Assume it's a turn on with brightness
                 tool_call = {
                     "function": {
-                        "name": "light_turn_on",
+                        "name": on_tool,
                         "arguments": {
                             "entity_id": entity_id,
                             **value  # Include brightness and other params
                         }
                     }
                 }
-            elif domain == "climate":
+            elif "temperature" in value:
                 # Extract temperature if present
-                if "temperature" in value:
-                    tool_call = {
-                        "function": {
-                            "name": "climate_set_temperature",
-                            "arguments": {
-                                "entity_id": entity_id,
-                                "temperature": value["temperature"]
-                            }
+                tool_call = {
+                    "function": {
+                        "name": temperature_tool,
+                        "arguments": {
+                            "entity_id": entity_id,
+                            "temperature": value["temperature"]
                         }
                     }
-                else:
-                    _LOGGER.warning(
-                        "Climate action missing temperature: %s = %s",
-                        entity_id, value
-                    )
-                    continue
+                }
             else:
-                _LOGGER.warning("Unknown domain in gemma3 format: %s", domain)
+                _LOGGER.warning(
+                    "Climate action missing temperature: %s = %s",
+                    entity_id, value
+                )
                 continue
         else:
             _LOGGER.warning(
@@ -233,34 +453,45 @@ def _parse_gemma3_tool_format(response: dict, domain_map: dict = None) -> list:
             )
             continue
         
-        if "tool_call" in locals():
+        if tool_call is not None:
             tool_calls.append(tool_call)
     
     return tool_calls
 
 def _extract_json_from_markdown(content: str):
     """Extract JSON from markdown code blocks."""
-    import json
-    import re
-    
     if not isinstance(content, str):
         return None
     
-    # Match code fences: ```json...content...``` or ```...content...```
-    pattern = r'[`]{3}(?:json)?\s*\n?(.*?)\n?[`]{3}'
-    matches = re.findall(pattern, content, re.DOTALL)
+    # Well-behaved models reply with a bare JSON object; parse it directly
+    stripped = content.strip()
+    bare_object = stripped[:1] == "{" and stripped[-1:] == "}"
+    if bare_object:
+        try:
+            return orjson.loads(stripped)
+        except orjson.JSONDecodeError:
+            pass
     
-    if matches:
-        for match in matches:
-            try:
-                return json.loads(match.strip())
-            except json.JSONDecodeError:
-                continue
+    # Walk code fences pairwise: ```json...content...``` or ```...content...```
+    start = content.find("```")
+    while start != -1:
+        end = content.find("```", start + 3)
+        if end == -1:
+            break
+        block = content[start + 3:end]
+        if block.startswith("json"):
+            block = block[4:]
+        try:
+            return orjson.loads(block.strip())
+        except orjson.JSONDecodeError:
+            start = content.find("```", end + 3)
     
-    # Try parsing the whole string as JSON
+    # Try parsing the whole string as JSON (already tried for a bare object)
+    if bare_object:
+        return None
     try:
-        return json.loads(content.strip())
-    except json.JSONDecodeError:
+        return orjson.loads(stripped)
+    except orjson.JSONDecodeError:
         return None
 
 
@@ -292,7 +523,7 @@ def _parse_qwen_tool_format(content: str) -> list:
     for match in matches:
         try:
             # Parse the JSON content inside the tool_call tags
-            tool_data = json.loads(match.strip())
+            tool_data = orjson.loads(match.strip())
             
             # Convert to standard tool_call format
             tool_call = {
@@ -305,7 +536,7 @@ def _parse_qwen_tool_format(content: str) -> list:
             tool_calls.append(tool_call)
             _LOGGER.debug("Parsed Qwen tool call: %s", tool_call)
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             _LOGGER.warning(
                 "Failed to parse Qwen tool call JSON: %s. Error: %s",
                 match[:100], str(e)
@@ -318,6 +549,121 @@ def _parse_qwen_tool_format(content: str) -> list:
     return tool_calls
 
 
+def _parse_args(function: dict) -> dict:
+    """Return a tool call's arguments as a dict.
+    
+    Some models send arguments as a JSON string. It is parsed once and
+    stored back on the call so later readers get the dict.
+    """
+    arguments = function.get("arguments")
+    if isinstance(arguments, dict):
+        return arguments
+    parsed = orjson.loads(arguments) if arguments else {}
+    if not isinstance(parsed, dict):
+        raise ValueError(f"Tool arguments must be an object, got {type(parsed).__name__}")
+    function["arguments"] = parsed
+    return parsed
+
+
+def _prepare_tool_call(tool_call: dict) -> tuple[str, dict] | str:
+    """Validate a tool call and build the data for its service call.
+    
+    Returns (function name, service data), or an error message for the
+    model if the call cannot be made.
+    """
+    function_name = tool_call["function"]["name"]
+    try:
+        arguments = _parse_args(tool_call["function"])
+    except ValueError:
+        _LOGGER.error("Failed to parse tool arguments: %s", tool_call["function"].get("arguments"))
+        return f"Error: Invalid arguments format"
+
+    dispatch = _TOOL_DISPATCH.get(function_name)
+    if dispatch is None:
+        return f"Unknown function: {function_name}"
+    required, optional = dispatch[2], dispatch[3]
+
+    if any(arguments.get(key) in (None, "") for key in required):
+        if len(required) == 1:
+            return f"Error: {function_name} requires {required[0]} parameter"
+        return f"Error: {function_name} requires {' and '.join(required)}"
+
+    # Required values were checked above, so one pass keeps every set value
+    service_data = {
+        key: value
+        for key in (*required, *optional)
+        if (value := arguments.get(key)) is not None
+    }
+    return function_name, service_data
+
+
+def _format_tool_result(function_name: str, service_data: dict) -> str:
+    """Describe a successful tool call for the model."""
+    optional, result_fmt = _TOOL_DISPATCH[function_name][3:]
+    result = result_fmt.format_map(service_data)
+    for key in optional:
+        if key in service_data:
+            result += _OPTIONAL_RESULT_FMT[key].format_map(service_data)
+    return result
+
+
+def _summarize_tool_call(tool_call: dict) -> str | None:
+    """Describe an executed tool call for a fallback confirmation."""
+    function = tool_call.get("function") or {}
+    function_name = function.get("name")
+    summary_fmt = _SUMMARY_FMT.get(function_name)
+    # Arguments were parsed in place when the call ran
+    args = function.get("arguments")
+    if summary_fmt is None or not isinstance(args, dict):
+        return None
+    try:
+        summary = summary_fmt.format_map({"entity_id": "device", **args})
+    except KeyError:
+        return None
+    for key in _TOOL_DISPATCH[function_name][3]:
+        if args.get(key):
+            summary += _OPTIONAL_RESULT_FMT[key].format_map(args)
+    return summary
+
+
+def _entities_fingerprint(entities: dict[str, dict[str, Any]]) -> tuple:
+    """Return the parts of the exposed entities that appear in the prompt."""
+    return tuple(
+        (
+            entity_id,
+            attrs.get("domain"),
+            attrs.get("friendly_name"),
+            attrs.get("state"),
+            attrs.get("unit"),
+            attrs.get("area_name"),
+        )
+        for entity_id, attrs in entities.items()
+    )
+
+
+def _trim_orphaned_tool_messages(history: deque, max_chars: int | None = None) -> list[dict]:
+    """Return history without leading tool results.
+    
+    When the bounded history evicts an assistant message, the tool results
+    that answered it may remain at the front. Sending those without the
+    call that produced them confuses the model, so they are dropped.
+    
+    If max_chars is given, the oldest messages are also dropped until the
+    remaining content fits in that many characters.
+    """
+    messages = list(history)
+    start = 0
+    if max_chars is not None:
+        start = len(messages)
+        while start:
+            max_chars -= len(messages[start - 1].get("content") or "")
+            if max_chars < 0:
+                break
+            start -= 1
+    while start < len(messages) and messages[start].get("role") == "tool":
+        start += 1
+    return messages[start:]
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -346,6 +692,63 @@ class OllamaConversationEntity(ConversationEntity):
             "manufacturer": "Ollama",
             "model": entry.data[CONF_MODEL],
         }
+        # Per-conversation message history, shared by all agents
+        self._conv_store: dict[str, deque] = hass.data.setdefault(_CONV_KEY, {})
+        # Last rendered system prompt and the entity fingerprint it was
+        # built from; reused until an exposed entity changes
+        self._prompt_cache: tuple[tuple, str] | None = None
+        self._system_message: dict | None = None
+        # Entities in the cached prompt. Once the entity is added to hass,
+        # change listeners set _prompt_stale; until then every turn rebuilds.
+        self._prompt_entity_ids: frozenset[str] = frozenset()
+        self._watching_entities = False
+        self._prompt_stale = True
+        # (system prompt hash, normalized utterance) -> (reply content, tool
+        # calls) for first turns, least recently used first
+        self._response_cache: OrderedDict[tuple[int, str], tuple[str, list | None]] = OrderedDict()
+        # Tool mode: devices are looked up on demand instead of listed in
+        # the system prompt
+        self._entity_lookup = (
+            entry.data.get(CONF_ENTITY_MODE, DEFAULT_ENTITY_MODE) == ENTITY_MODE_TOOL
+        )
+        # Bounds the service calls a single multi-device request fans out to
+        self._tool_semaphore = asyncio.Semaphore(MAX_CONCURRENT_TOOL_CALLS)
+
+    async def async_added_to_hass(self) -> None:
+        """Watch for changes that affect the exposed device listing."""
+        await super().async_added_to_hass()
+        if self._entity_lookup:
+            # Tool mode uses a fixed prompt and looks devices up on demand
+            return
+
+        @callback
+        def mark_stale(*_: Any) -> None:
+            self._prompt_stale = True
+
+        @callback
+        def state_changed(event: Event) -> None:
+            data = event.data
+            # Entities in the prompt, plus entities being added or removed
+            if (
+                data["entity_id"] in self._prompt_entity_ids
+                or data.get("old_state") is None
+                or data.get("new_state") is None
+            ):
+                self._prompt_stale = True
+
+        bus = self.hass.bus
+        self.async_on_remove(bus.async_listen(EVENT_STATE_CHANGED, state_changed))
+        for event_type in (
+            er.EVENT_ENTITY_REGISTRY_UPDATED,
+            dr.EVENT_DEVICE_REGISTRY_UPDATED,
+            ar.EVENT_AREA_REGISTRY_UPDATED,
+        ):
+            self.async_on_remove(bus.async_listen(event_type, mark_stale))
+        self.async_on_remove(
+            async_listen_entity_updates(self.hass, conversation.DOMAIN, mark_stale)
+        )
+        self._watching_entities = True
+        self._prompt_stale = True
 
     @property
     def supported_languages(self) -> list[str] | Literal["*"]:
@@ -363,104 +766,183 @@ class OllamaConversationEntity(ConversationEntity):
         """Process a sentence."""
         client = self.hass.data[DOMAIN][self.entry.entry_id]
         model = self.entry.data[CONF_MODEL]
-        temperature = self.entry.data.get(CONF_TEMPERATURE, 0.7)
+        temperature = self.entry.data.get(CONF_TEMPERATURE, DEFAULT_TEMPERATURE)
+        language = user_input.language
 
         # Build conversation history
         messages = []
         
         # System prompt with entity context (now async!)
-        system_prompt = await self._build_system_prompt()
-        messages.append({"role": "system", "content": system_prompt})
+        system_message = await self._get_system_message()
+        messages.append(system_message)
         
-        # Add conversation history if available
+        # Add conversation history if available, keeping the request within
+        # the model's context window
         if user_input.conversation_id:
-            conversation_data = self.hass.data.get(f"{DOMAIN}_conversations", {})
-            history = conversation_data.get(user_input.conversation_id, [])
-            messages.extend(history)
+            history = self._conv_store.get(user_input.conversation_id)
+            if history:
+                max_chars = (
+                    self.entry.data.get(CONF_CONTEXT_WINDOW, DEFAULT_CONTEXT_WINDOW) * CHARS_PER_TOKEN
+                    - len(system_message["content"])
+                    - len(user_input.text)
+                )
+                messages.extend(_trim_orphaned_tool_messages(history, max_chars))
         
-        # Add user message
+        # Add user message; everything from here on is new for this turn
+        turn_start = len(messages)
         messages.append({"role": "user", "content": user_input.text})
 
         # Get available tools
         tools = self._get_ha_tools()
 
+        # Without history the first reply depends only on the prompt and the
+        # utterance, so it can be reused for an identical request. The prompt
+        # is keyed by its hash (cached on the string) rather than kept, so
+        # each entry costs the utterance, not another copy of the listing.
+        cache_key = None
+        if turn_start == 1:
+            cache_key = (hash(messages[0]["content"]), " ".join(user_input.text.lower().split()))
+
+        # Ollama sends each tool call complete in a single chunk, so standard
+        # calls are started while the rest of the reply is still streaming
+        tool_tasks: list[asyncio.Task] = []
+
+        def start_tool_calls(chunk: dict) -> None:
+            if calls := (chunk.get("message") or {}).get("tool_calls"):
+                tool_tasks.append(asyncio.create_task(self._execute_tool_calls(calls)))
+
         try:
-            # Send to Ollama
-            response = await client.chat(
-                messages=messages,
-                model=model,
-                tools=tools,
-                temperature=temperature,
-            )
+            cached = None
+            if cache_key is not None and (cached := self._response_cache.get(cache_key)):
+                # Same utterance against the same prompt: reuse the model's
+                # first reply. Tool calls in it are still executed below.
+                self._response_cache.move_to_end(cache_key)
+                content_text, tool_calls = cached
+                message_content = {"role": "assistant", "content": content_text}
+                _LOGGER.debug("Reusing cached reply for: %s", user_input.text)
+            else:
+                # Send to Ollama
+                response = await client.chat(
+                    messages=messages,
+                    model=model,
+                    tools=tools,
+                    temperature=temperature,
+                    stream=True,
+                    on_chunk=start_tool_calls,
+                )
 
-            # Extract message content
-            message_content = response.get("message", {})
-            tool_calls = None
+                # Extract message content; the standard tool_calls field is the
+                # cheapest check, so it is read once up front
+                message_content = response.get("message") or {}
+                tool_calls = message_content.get("tool_calls")
             
-            # DEBUG: Log the full response to see what we got
-            _LOGGER.debug("Full response from Ollama: %s", response)
-            _LOGGER.debug("Message content keys: %s", list(message_content.keys()))
+                # DEBUG: Log the full response to see what we got
+                if _LOGGER.isEnabledFor(logging.DEBUG):
+                    _LOGGER.debug("Full response from Ollama: %s", response)
+                    _LOGGER.debug("Message content keys: %s", list(message_content))
             
-            # Try to extract JSON from markdown code blocks in content
-            content_text = message_content.get("content", "")
-            json_from_content = _extract_json_from_markdown(content_text)
+                content_text = message_content.get("content", "")
             
-            # Handle tool calls - check for standard, gemma3-tools, and qwen formats
-            if "tool_calls" in message_content:
-                # Standard format
-                tool_calls = message_content.get("tool_calls")
-                _LOGGER.info("Detected standard tool call format: %s", tool_calls)
-            elif "<tool_call>" in content_text:
-                # Qwen format with <tool_call> XML tags
-                _LOGGER.info("Detected Qwen tool call format, extracting...")
-                tool_calls = _parse_qwen_tool_format(content_text)
-                if tool_calls:
-                    _LOGGER.info("Converted %d Qwen tool calls to standard format: %s", len(tool_calls), tool_calls)
-            elif _is_gemma3_tool_format(message_content):
-                # Gemma3-tools format in message structure
-                _LOGGER.info("Detected gemma3-tools format in message structure, converting...")
-                tool_calls = _parse_gemma3_tool_format(message_content)
+                # Handle tool calls - check for standard, gemma3-tools, and qwen formats
                 if tool_calls:
-                    _LOGGER.info("Converted %d gemma3-tools calls to standard format: %s", len(tool_calls), tool_calls)
-            elif json_from_content and _is_gemma3_tool_format(json_from_content):
-                # Gemma3-tools format in markdown code block
-                _LOGGER.info("Detected gemma3-tools format in markdown code block, converting...")
-                tool_calls = _parse_gemma3_tool_format(json_from_content)
-                if tool_calls:
-                    _LOGGER.info("Converted %d gemma3-tools calls from markdown: %s", len(tool_calls), tool_calls)
-            else:
-                _LOGGER.warning("No tool calls detected in response. Content: %s", content_text[:500])
+                    # Standard format
+                    _LOGGER.info("Detected standard tool call format: %s", tool_calls)
+                elif "<tool_call>" in content_text:
+                    # Qwen format with <tool_call> XML tags
+                    _LOGGER.info("Detected Qwen tool call format, extracting...")
+                    tool_calls = _parse_qwen_tool_format(content_text)
+                    if tool_calls:
+                        _LOGGER.info("Converted %d Qwen tool calls to standard format: %s", len(tool_calls), tool_calls)
+                elif _is_gemma3_tool_format(message_content):
+                    # Gemma3-tools format in message structure
+                    _LOGGER.info("Detected gemma3-tools format in message structure, converting...")
+                    tool_calls = _parse_gemma3_tool_format(message_content)
+                    if tool_calls:
+                        _LOGGER.info("Converted %d gemma3-tools calls to standard format: %s", len(tool_calls), tool_calls)
+                elif (
+                    # Try to extract JSON from markdown code blocks in content;
+                    # plain-text replies, the common case, cannot hold any
+                    ("```" in content_text or content_text.lstrip().startswith("{"))
+                    and (json_from_content := _extract_json_from_markdown(content_text))
+                    and _is_gemma3_tool_format(json_from_content)
+                ):
+                    # Gemma3-tools format in markdown code block
+                    _LOGGER.info("Detected gemma3-tools format in markdown code block, converting...")
+                    tool_calls = _parse_gemma3_tool_format(json_from_content)
+                    if tool_calls:
+                        _LOGGER.info("Converted %d gemma3-tools calls from markdown: %s", len(tool_calls), tool_calls)
+                else:
+                    _LOGGER.warning("No tool calls detected in response. Content: %s", content_text[:500])
             
             # Execute tool calls if any were found
             if tool_calls:
                 _LOGGER.info("Executing %d tool calls", len(tool_calls))
                 messages.append({
                     "role": "assistant",
-                    "content": message_content.get("content", "")
+                    "content": content_text
                 })
                 
-                # Execute tool calls
-                tool_results = []
-                for tool_call in tool_calls:
-                    tool_result = await self._execute_tool_call(tool_call)
-                    tool_results.append(tool_result)
+                # Execute tool calls concurrently; results keep the call order
+                if tool_tasks:
+                    tool_results = [
+                        result
+                        for results in await asyncio.gather(*tool_tasks)
+                        for result in results
+                    ]
+                else:
+                    tool_results = await self._execute_tool_calls(tool_calls)
+                if not all(result.startswith("Successfully") for result in tool_results):
+                    # Never replay calls that failed or were rejected
+                    cache_key = None
+                for tool_result in tool_results:
                     messages.append({
                         "role": "tool",
-                        "content": str(tool_result),
+                        "content": tool_result,
                     })
                 
+                # A device lookup only gathers context, so the model gets the
+                # tools again to act on what it found
+                looked_up = self._entity_lookup and any(
+                    tool_call["function"]["name"] == _ENTITY_LOOKUP_TOOL
+                    for tool_call in tool_calls
+                )
+                if looked_up:
+                    # Follow-up actions were chosen from the states the lookup
+                    # returned, so the turn must not be replayed later
+                    cache_key = None
+
                 # Get final response after tool execution
                 _LOGGER.debug("Requesting final response after tool execution")
                 response = await client.chat(
                     messages=messages,
                     model=model,
+                    tools=tools if looked_up else None,
                     temperature=temperature,
+                    stream=True,
                 )
                 
-                raw_response = response.get("message", {}).get("content", "")
-                _LOGGER.debug("Raw response from model: %s", raw_response[:200] if raw_response else "(empty)")
+                message_content = response.get("message") or {}
+                if looked_up and (more_calls := message_content.get("tool_calls")):
+                    messages.append({
+                        "role": "assistant",
+                        "content": message_content.get("content", ""),
+                    })
+                    for tool_result in await self._execute_tool_calls(more_calls):
+                        messages.append({"role": "tool", "content": tool_result})
+                    tool_calls = [*tool_calls, *more_calls]
+                    response = await client.chat(
+                        messages=messages,
+                        model=model,
+                        temperature=temperature,
+                        stream=True,
+                    )
+                    message_content = response.get("message") or {}
+                _LOGGER.debug(
+                    "Raw response from model: %s",
+                    message_content.get("content", "")[:200] or "(empty)",
+                )
 
-            response_text = response.get("message", {}).get("content", "")
+            response_text = message_content.get("content", "")
             
             # Filter out think blocks before returning to user
             filtered_text = _filter_think_blocks(response_text)
@@ -474,23 +956,11 @@ class OllamaConversationEntity(ConversationEntity):
                 # If we executed tools, confirm the action
                 if tool_calls:
                     # Build a simple confirmation based on what was executed
-                    action_summaries = []
-                    for tool_call in tool_calls:
-                        func_name = tool_call.get("function", {}).get("name", "")
-                        args = tool_call.get("function", {}).get("arguments", {})
-                        entity_id = args.get("entity_id", "device")
-                        
-                        if func_name == "light_turn_on":
-                            brightness = args.get("brightness")
-                            if brightness:
-                                action_summaries.append(f"turned on {entity_id} to {brightness} brightness")
-                            else:
-                                action_summaries.append(f"turned on {entity_id}")
-                        elif func_name == "light_turn_off":
-                            action_summaries.append(f"turned off {entity_id}")
-                        elif func_name == "climate_set_temperature":
-                            temp = args.get("temperature")
-                            action_summaries.append(f"set {entity_id} to {temp}°")
+                    action_summaries = [
+                        summary
+                        for tool_call in tool_calls
+                        if (summary := _summarize_tool_call(tool_call))
+                    ]
                     
                     if action_summaries:
                         filtered_text = f"Done! I've {', and '.join(action_summaries)}."
@@ -499,14 +969,22 @@ class OllamaConversationEntity(ConversationEntity):
                 else:
                     filtered_text = "I've processed your request."
 
-            # Store conversation history
+            if cache_key is not None and cached is None:
+                self._response_cache[cache_key] = (content_text, tool_calls)
+                if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+                    self._response_cache.popitem(last=False)
+
+            # Store conversation history (system prompt excluded, it is rebuilt every turn)
             conversation_id = user_input.conversation_id or ulid.ulid_now()
-            if DOMAIN + "_conversations" not in self.hass.data:
-                self.hass.data[f"{DOMAIN}_conversations"] = {}
-            
-            self.hass.data[f"{DOMAIN}_conversations"][conversation_id] = messages[-10:]  # Keep last 10 messages
+            history = self._conv_store.get(conversation_id)
+            if history is None:
+                history = self._conv_store[conversation_id] = deque(
+                    maxlen=self.entry.data.get(CONF_MAX_HISTORY, MAX_HISTORY)
+                )
+            history.extend(messages[turn_start:])
+            history.append({"role": "assistant", "content": filtered_text})
 
-            intent_response = intent.IntentResponse(language=user_input.language)
+            intent_response = intent.IntentResponse(language=language)
             intent_response.async_set_speech(filtered_text)
             
             return ConversationResult(
@@ -515,11 +993,17 @@ class OllamaConversationEntity(ConversationEntity):
             )
 
         except Exception as err:
-            _LOGGER.exception("Error processing conversation: %s", err)
-            intent_response = intent.IntentResponse(language=user_input.language)
+            _LOGGER.exception("Error processing conversation")
+            # Don't leave tool calls started mid-stream running behind the
+            # error; unfinished ones are cancelled and all are reaped
+            if tool_tasks:
+                for task in tool_tasks:
+                    task.cancel()
+                await asyncio.gather(*tool_tasks, return_exceptions=True)
+            intent_response = intent.IntentResponse(language=language)
             intent_response.async_set_error(
                 intent.IntentResponseErrorCode.UNKNOWN,
-                f"Sorry, I encountered an error: {str(err)}"
+                f"Sorry, I encountered an error: {err}"
             )
             return ConversationResult(
                 response=intent_response,
@@ -534,183 +1018,141 @@ class OllamaConversationEntity(ConversationEntity):
         - Information about device locations (areas)
         - Specific instructions for tool usage
         """
+        if self._entity_lookup:
+            return _LOOKUP_SYSTEM_PROMPT
+        if not self._prompt_stale and (cached := self._prompt_cache):
+            # Nothing the listing depends on has changed since it was built
+            return cached[1]
         # Get all exposed entities
         entities = await async_get_exposed_entities(self.hass)
+        # Without change listeners the entities are re-collected every turn
+        self._prompt_stale = not self._watching_entities
+        self._prompt_entity_ids = frozenset(entities)
+        fingerprint = _entities_fingerprint(entities)
+        if (cached := self._prompt_cache) and cached[0] == fingerprint:
+            return cached[1]
         formatted_entities = format_entities_for_prompt(entities)
         
-        system_prompt = f"""You are a helpful Home Assistant assistant that can control smart home devices.
-
-{formatted_entities}
-
-**Your Capabilities:**
-You can interact with the devices listed above using these tools:
-- light_turn_on: Turn on a light or adjust brightness
-- light_turn_off: Turn off a light
-- climate_set_temperature: Set target temperature for climate devices
-
-**Important Instructions:**
-1. Always use the EXACT entity_id when calling tools (e.g., light.living_room, not "living room light")
-2. Entity IDs use the format: domain.device_name (e.g., light.kitchen, climate.bedroom)
-3. When the user refers to a device by name, find the matching entity_id from the list above
-4. If a device name is ambiguous or not found, ask the user for clarification
-5. Always confirm what action you're performing before executing
-6. After taking an action, provide a brief, natural confirmation to the user
-
-**Response Format:**
-- Do NOT use <think> tags or internal reasoning blocks in your responses
-- Provide clear, concise responses directly to the user
-- After executing a tool, simply confirm what was done (e.g., "I've turned off the desk lamp.")
-- Keep confirmations brief and natural
-
-**Example Interactions:**
-- User: "Turn on the kitchen light" → You use light_turn_on with entity_id "light.kitchen" → You respond: "I've turned on the kitchen light."
-- User: "Set the bedroom to 72 degrees" → You use climate_set_temperature with entity_id "climate.bedroom" and temperature 72 → You respond: "I've set the bedroom temperature to 72°."
-- User: "Turn off all lights" → You ask which lights since there are multiple, or turn off each one separately
-
-Now respond helpfully to the user's request."""
+        system_prompt = _SYSTEM_TEMPLATE.format_map({"entities": formatted_entities})
 
+        self._prompt_cache = (fingerprint, system_prompt)
         return system_prompt
 
-    def _get_ha_tools(self) -> list[dict]:
-        """Get available Home Assistant tools for the model."""
-        tools = []
-        
-        # Light control
-        tools.append({
-            "type": "function",
-            "function": {
-                "name": "light_turn_on",
-                "description": "Turn on a light or adjust its brightness",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "entity_id": {
-                            "type": "string",
-                            "description": "The entity ID of the light (e.g., light.living_room)"
-                        },
-                        "brightness": {
-                            "type": "integer",
-                            "description": "Brightness level (0-255)",
-                            "minimum": 0,
-                            "maximum": 255
-                        }
-                    },
-                    "required": ["entity_id"]
-                }
-            }
-        })
+    async def _get_system_message(self) -> dict:
+        """Return the system message for this turn.
         
-        tools.append({
-            "type": "function",
-            "function": {
-                "name": "light_turn_off",
-                "description": "Turn off a light",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "entity_id": {
-                            "type": "string",
-                            "description": "The entity ID of the light"
-                        }
-                    },
-                    "required": ["entity_id"]
-                }
-            }
-        })
+        The same dict is returned while the prompt is unchanged, so the
+        client can reuse its encoded JSON as well.
+        """
+        system_prompt = await self._build_system_prompt()
+        if (message := self._system_message) is None or message["content"] is not system_prompt:
+            message = self._system_message = {"role": "system", "content": system_prompt}
+        return message
 
-        # Climate control
-        tools.append({
-            "type": "function",
-            "function": {
-                "name": "climate_set_temperature",
-                "description": "Set the temperature for a climate device",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "entity_id": {
-                            "type": "string",
-                            "description": "The entity ID of the climate device"
-                        },
-                        "temperature": {
-                            "type": "number",
-                            "description": "Target temperature"
-                        }
-                    },
-                    "required": ["entity_id", "temperature"]
-                }
-            }
-        })
+    def _get_ha_tools(self) -> tuple[dict, ...]:
+        """Get available Home Assistant tools for the model."""
+        if self._entity_lookup:
+            return _HA_TOOLS_WITH_LOOKUP
+        return _HA_TOOLS
 
-        return tools
+    async def _lookup_entities(self, tool_call: dict) -> str:
+        """Answer a get_exposed_entities call with the current device listing."""
+        try:
+            domain = _parse_args(tool_call["function"]).get("domain")
+        except ValueError:
+            domain = None
+        entities = await async_get_exposed_entities(self.hass)
+        if domain:
+            entities = {
+                entity_id: attrs
+                for entity_id, attrs in entities.items()
+                if attrs["domain"] == domain
+            }
+        return format_entities_for_prompt(entities)
 
     async def _execute_tool_call(self, tool_call: dict) -> str:
         """Execute a tool call and return the result."""
-        function_name = tool_call["function"]["name"]
-        arguments = tool_call["function"].get("arguments", {})
+        prepared = _prepare_tool_call(tool_call)
+        if isinstance(prepared, str):
+            return prepared
+        return await self._run_tool(*prepared)
+
+    async def _execute_tool_calls(self, tool_calls: list[dict]) -> list[str]:
+        """Execute tool calls and return their results in call order.
         
-        # Parse arguments if they're a string
-        if isinstance(arguments, str):
+        Calls to the same tool that differ only in entity_id (e.g. turning
+        off several lights) are merged into one service call with a list of
+        entity_ids. Independent calls run concurrently.
+        """
+        results = [""] * len(tool_calls)
+        groups: dict[tuple, list[tuple[int, dict]]] = {}
+        lookups: list[tuple[int, dict]] = []
+        for index, tool_call in enumerate(tool_calls):
+            if tool_call["function"]["name"] == _ENTITY_LOOKUP_TOOL and self._entity_lookup:
+                lookups.append((index, tool_call))
+                continue
             try:
-                arguments = json.loads(arguments)
-            except json.JSONDecodeError:
-                _LOGGER.error("Failed to parse tool arguments: %s", arguments)
-                return f"Error: Invalid arguments format"
-
-        try:
-            if function_name == "light_turn_on":
-                entity_id = arguments.get("entity_id")
-                brightness = arguments.get("brightness")
-                
-                if not entity_id:
-                    return "Error: light_turn_on requires entity_id parameter"
-                
-                service_data = {"entity_id": entity_id}
-                if brightness is not None:
-                    service_data["brightness"] = brightness
-                
-                await self.hass.services.async_call(
-                    "light",
-                    "turn_on",
-                    service_data,
-                    blocking=True,
-                )
-                
-                if brightness is not None:
-                    return f"Successfully turned on {entity_id} to {brightness} brightness"
-                return f"Successfully turned on {entity_id}"
+                prepared = _prepare_tool_call(tool_call)
+            except Exception as err:
+                _LOGGER.error("Tool call %s failed: %s", tool_call, err)
+                results[index] = f"Error: {err}"
+                continue
+            if isinstance(prepared, str):
+                results[index] = prepared
+                continue
+            function_name, service_data = prepared
+            if not isinstance(service_data["entity_id"], str):
+                # Calls that already target several entities run on their own
+                key: tuple = (function_name, index)
+            else:
+                shared = {k: v for k, v in service_data.items() if k != "entity_id"}
+                key = (function_name, orjson.dumps(shared, option=orjson.OPT_SORT_KEYS))
+            groups.setdefault(key, []).append((index, service_data))
 
-            elif function_name == "light_turn_off":
-                entity_id = arguments.get("entity_id")
-                
-                if not entity_id:
-                    return "Error: light_turn_off requires entity_id parameter"
-                
-                await self.hass.services.async_call(
-                    "light",
-                    "turn_off",
-                    {"entity_id": entity_id},
-                    blocking=True,
+        async def run_group(function_name: str, calls: list[tuple[int, dict]]) -> None:
+            if len(calls) == 1:
+                index, service_data = calls[0]
+                results[index] = await self._run_tool(function_name, service_data)
+                return
+            entity_ids = list(dict.fromkeys(data["entity_id"] for _, data in calls))
+            try:
+                await self._call_service(
+                    function_name, {**calls[0][1], "entity_id": entity_ids}
                 )
-                return f"Successfully turned off {entity_id}"
+            except Exception as err:
+                _LOGGER.error("Error executing tool call %s: %s", function_name, err)
+                for index, _ in calls:
+                    results[index] = f"Error executing {function_name}: {str(err)}"
+                return
+            for index, service_data in calls:
+                results[index] = _format_tool_result(function_name, service_data)
 
-            elif function_name == "climate_set_temperature":
-                entity_id = arguments.get("entity_id")
-                temperature = arguments.get("temperature")
-                
-                if not entity_id or temperature is None:
-                    return "Error: climate_set_temperature requires entity_id and temperature"
-                
-                await self.hass.services.async_call(
-                    "climate",
-                    "set_temperature",
-                    {"entity_id": entity_id, "temperature": temperature},
-                    blocking=True,
-                )
-                return f"Successfully set {entity_id} to {temperature}°"
+        async def run_lookup(index: int, tool_call: dict) -> None:
+            results[index] = await self._lookup_entities(tool_call)
 
-            else:
-                return f"Unknown function: {function_name}"
+        await asyncio.gather(
+            *(run_group(key[0], calls) for key, calls in groups.items()),
+            *(run_lookup(index, tool_call) for index, tool_call in lookups),
+        )
+        return results
 
+    async def _run_tool(self, function_name: str, service_data: dict) -> str:
+        """Call the service behind a prepared tool call and describe the result."""
+        try:
+            await self._call_service(function_name, service_data)
         except Exception as err:
             _LOGGER.error("Error executing tool call %s: %s", function_name, err)
             return f"Error executing {function_name}: {str(err)}"
+
+        return _format_tool_result(function_name, service_data)
+
+    async def _call_service(self, function_name: str, service_data: dict) -> None:
+        """Call the Home Assistant service a tool maps to."""
+        domain, service = _TOOL_DISPATCH[function_name][:2]
+        async with self._tool_semaphore:
+            await self.hass.services.async_call(
+                domain,
+                service,
+                service_data,
+                blocking=True,
+            )
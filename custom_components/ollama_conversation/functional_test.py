@@ -8,18 +8,84 @@ This test simulates a complete integration workflow including:
 - Tool calling for device control
 - Multi-turn conversation
 
-Run: python functional_test.py
+Run: python functional_test.py [--verbose]
 """
 
 import asyncio
+import copy
 import json
+import re
+import sys
+import time
 from datetime import datetime
 
+try:
+    import orjson
+
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:  # standalone run without Home Assistant's deps
+    def _dumps(obj):
+        return json.dumps(obj, indent=2)
+
+# Intent dispatch for the mock: one match from the start of the message,
+# with the light branch taking precedence as the substring checks did.
+_INTENT_RE = re.compile(
+    r"(?=.*turn on)(?=.*light)(?P<light>)"
+    r"|(?=.*temperature)(?=.*set)(?P<climate>)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Canned replies are built once; chat() returns deep copies of them, so a
+# caller that edits a reply cannot change the next one.
+_LIGHT_TOOLCALL_RESPONSE = {
+    "message": {
+        "role": "assistant",
+        "content": "",
+        "tool_calls": [
+            {
+                "function": {
+                    "name": "light_turn_on",
+                    "arguments": {
+                        "entity_id": "light.living_room"
+                    }
+                }
+            }
+        ]
+    }
+}
+
+_CLIMATE_TOOLCALL_RESPONSE = {
+    "message": {
+        "role": "assistant",
+        "content": "",
+        "tool_calls": [
+            {
+                "function": {
+                    "name": "climate_set_temperature",
+                    "arguments": {
+                        "entity_id": "climate.bedroom",
+                        "temperature": 72
+                    }
+                }
+            }
+        ]
+    }
+}
+
+_TEXT_RESPONSE = {
+    "message": {
+        "role": "assistant",
+        "content": "I've completed your request. Is there anything else I can help you with?"
+    }
+}
+
 
 class MockOllamaServer:
     """Mock Ollama server for testing."""
     
-    def __init__(self):
+    def __init__(self, log=print):
+        self._log = log
         self.models = [
             {"name": "Home-FunctionGemma-270m"},
             {"name": "llama2"},
@@ -29,70 +95,46 @@ class MockOllamaServer:
     
     async def list_models(self):
         """Return available models."""
-        print("📋 Listing available models...")
+        self._log("📋 Listing available models...")
         return {"models": self.models}
     
     async def chat(self, messages, model, tools=None, temperature=0.7):
         """Simulate chat with tool calling."""
         user_message = messages[-1]["content"]
-        print(f"💬 User: {user_message}")
+        self._log(f"💬 User: {user_message}")
         
         # Simulate tool calling for device control
-        if "turn on" in user_message.lower() and "light" in user_message.lower():
+        match = _INTENT_RE.match(user_message)
+        intent = match.lastgroup if match else None
+        if intent == "light":
             # First response: Tool call
-            return {
-                "message": {
-                    "role": "assistant",
-                    "content": "",
-                    "tool_calls": [
-                        {
-                            "function": {
-                                "name": "light_turn_on",
-                                "arguments": {
-                                    "entity_id": "light.living_room"
-                                }
-                            }
-                        }
-                    ]
-                }
-            }
+            return copy.deepcopy(_LIGHT_TOOLCALL_RESPONSE)
         
-        elif "temperature" in user_message.lower() and "set" in user_message.lower():
+        elif intent == "climate":
             # Climate control
-            return {
-                "message": {
-                    "role": "assistant",
-                    "content": "",
-                    "tool_calls": [
-                        {
-                            "function": {
-                                "name": "climate_set_temperature",
-                                "arguments": {
-                                    "entity_id": "climate.bedroom",
-                                    "temperature": 72
-                                }
-                            }
-                        }
-                    ]
-                }
-            }
+            return copy.deepcopy(_CLIMATE_TOOLCALL_RESPONSE)
         
         # Regular response (after tool execution or no tools needed)
-        return {
-            "message": {
-                "role": "assistant",
-                "content": "I've completed your request. Is there anything else I can help you with?"
-            }
-        }
+        return copy.deepcopy(_TEXT_RESPONSE)
 
 
 class FunctionalTest:
     """Complete functional test suite."""
     
-    def __init__(self):
-        self.server = MockOllamaServer()
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self._log_buf: list[str] = []
+        self.server = MockOllamaServer(log=self._emit)
         self.test_results = []
-        self.start_time = datetime.now()
+        self.started_at = datetime.now()
+        self.start_time = time.perf_counter()
+    
+    def _emit(self, line):
+        """Print immediately in verbose mode, otherwise buffer until the summary."""
+        if self.verbose:
+            print(line)
+        else:
+            self._log_buf.append(line)
     
     def log_test(self, name, passed, details=""):
         """Log test result."""
@@ -102,13 +144,13 @@ class FunctionalTest:
             "passed": passed,
             "details": details
         })
-        print(f"{status} - {name}")
+        self._emit(f"{status} - {name}")
         if details:
-            print(f"   └─ {details}")
+            self._emit(f"   └─ {details}")
     
     async def test_connection(self):
         """Test 1: Validate connection to Ollama."""
-        print("\n🔌 TEST 1: Connection Validation")
+        self._emit("\n🔌 TEST 1: Connection Validation")
         try:
             result = await self.server.list_models()
             models = result.get("models", [])
@@ -124,7 +166,7 @@ class FunctionalTest:
     
     async def test_model_selection(self):
         """Test 2: Model selection and configuration."""
-        print("\n🤖 TEST 2: Model Selection")
+        self._emit("\n🤖 TEST 2: Model Selection")
         try:
             result = await self.server.list_models()
             models = result.get("models", [])
@@ -147,7 +189,7 @@ class FunctionalTest:
     
     async def test_simple_conversation(self):
         """Test 3: Simple conversation without tools."""
-        print("\n💭 TEST 3: Simple Conversation")
+        self._emit("\n💭 TEST 3: Simple Conversation")
         try:
             messages = [
                 {"role": "system", "content": "You are a helpful assistant."},
@@ -169,7 +211,7 @@ class FunctionalTest:
     
     async def test_tool_calling_light(self):
         """Test 4: Tool calling for light control."""
-        print("\n💡 TEST 4: Light Control (Tool Calling)")
+        self._emit("\n💡 TEST 4: Light Control (Tool Calling)")
         try:
             messages = [
                 {"role": "system", "content": "You are a home automation assistant."},
@@ -202,12 +244,12 @@ class FunctionalTest:
                 function_name = tool_call["function"]["name"]
                 arguments = tool_call["function"]["arguments"]
                 
-                print(f"   🔧 Tool Called: {function_name}")
-                print(f"   📝 Arguments: {json.dumps(arguments, indent=6)}")
+                self._emit(f"   🔧 Tool Called: {function_name}")
+                self._emit(f"   📝 Arguments: {_dumps(arguments)}")
                 
                 # Simulate tool execution
                 tool_result = f"Successfully turned on {arguments['entity_id']}"
-                print(f"   ✨ Result: {tool_result}")
+                self._emit(f"   ✨ Result: {tool_result}")
                 
                 # Second call: Get natural language response
                 messages.append(response["message"])
@@ -217,7 +259,7 @@ class FunctionalTest:
                 has_final_response = "content" in final_response.get("message", {})
                 
                 if has_final_response:
-                    print(f"   🤖 Assistant: {final_response['message']['content']}")
+                    self._emit(f"   🤖 Assistant: {final_response['message']['content']}")
                 
                 self.log_test(
                     "Light Control",
@@ -234,7 +276,7 @@ class FunctionalTest:
     
     async def test_tool_calling_climate(self):
         """Test 5: Tool calling for climate control."""
-        print("\n🌡️  TEST 5: Climate Control (Tool Calling)")
+        self._emit("\n🌡️  TEST 5: Climate Control (Tool Calling)")
         try:
             messages = [
                 {"role": "system", "content": "You are a home automation assistant."},
@@ -267,8 +309,8 @@ class FunctionalTest:
                 function_name = tool_call["function"]["name"]
                 arguments = tool_call["function"]["arguments"]
                 
-                print(f"   🔧 Tool Called: {function_name}")
-                print(f"   📝 Arguments: {json.dumps(arguments, indent=6)}")
+                self._emit(f"   🔧 Tool Called: {function_name}")
+                self._emit(f"   📝 Arguments: {_dumps(arguments)}")
                 
                 self.log_test(
                     "Climate Control",
@@ -285,7 +327,7 @@ class FunctionalTest:
     
     async def test_multi_turn_conversation(self):
         """Test 6: Multi-turn conversation with context."""
-        print("\n🔄 TEST 6: Multi-turn Conversation")
+        self._emit("\n🔄 TEST 6: Multi-turn Conversation")
         try:
             conversation = []
             
@@ -312,7 +354,7 @@ class FunctionalTest:
     
     async def test_error_handling(self):
         """Test 7: Error handling and recovery."""
-        print("\n⚠️  TEST 7: Error Handling")
+        self._emit("\n⚠️  TEST 7: Error Handling")
         try:
             # Test with invalid entity
             messages = [
@@ -333,48 +375,61 @@ class FunctionalTest:
     
     def print_summary(self):
         """Print test summary."""
-        elapsed = (datetime.now() - self.start_time).total_seconds()
+        elapsed = time.perf_counter() - self.start_time
         passed = sum(1 for t in self.test_results if t["passed"])
         total = len(self.test_results)
         
-        print("\n" + "="*60)
-        print("📊 TEST SUMMARY")
-        print("="*60)
-        print(f"Total Tests: {total}")
-        print(f"Passed: {passed}")
-        print(f"Failed: {total - passed}")
-        print(f"Success Rate: {(passed/total*100):.1f}%")
-        print(f"Duration: {elapsed:.2f}s")
-        print("="*60)
+        self._emit("\n" + "="*60)
+        self._emit("📊 TEST SUMMARY")
+        self._emit("="*60)
+        self._emit(f"Total Tests: {total}")
+        self._emit(f"Passed: {passed}")
+        self._emit(f"Failed: {total - passed}")
+        self._emit(f"Success Rate: {(passed/total*100):.1f}%")
+        self._emit(f"Duration: {elapsed:.2f}s")
+        self._emit("="*60)
         
         if passed == total:
-            print("✅ All tests passed!")
+            self._emit("✅ All tests passed!")
         else:
-            print("⚠️  Some tests failed. Check logs above.")
+            self._emit("⚠️  Some tests failed. Check logs above.")
+    
+    def _flush(self):
+        """Write out any buffered output."""
+        if self._log_buf:
+            sys.stdout.write("\n".join(self._log_buf) + "\n")
+            self._log_buf.clear()
     
     async def run_all_tests(self):
         """Run complete test suite."""
-        print("="*60)
-        print("🧪 OLLAMA CONVERSATION INTEGRATION - FUNCTIONAL TEST")
-        print("="*60)
-        print(f"Started at: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        await self.test_connection()
-        await self.test_model_selection()
-        await self.test_simple_conversation()
-        await self.test_tool_calling_light()
-        await self.test_tool_calling_climate()
-        await self.test_multi_turn_conversation()
-        await self.test_error_handling()
+        self._emit("="*60)
+        self._emit("🧪 OLLAMA CONVERSATION INTEGRATION - FUNCTIONAL TEST")
+        self._emit("="*60)
+        self._emit(f"Started at: {self.started_at.strftime('%Y-%m-%d %H:%M:%S')}")
         
-        self.print_summary()
+        try:
+            # Tests 1-3 and 7 share no state, so run them together
+            await asyncio.gather(
+                self.test_connection(),
+                self.test_model_selection(),
+                self.test_simple_conversation(),
+                self.test_error_handling(),
+            )
+            await self.test_tool_calling_light()
+            await self.test_tool_calling_climate()
+            await self.test_multi_turn_conversation()
+            
+            self.print_summary()
+        finally:
+            # Buffered output must survive a crash in the suite itself
+            self._flush()
         
         return all(t["passed"] for t in self.test_results)
 
 
 async def main():
     """Run functional tests."""
-    test = FunctionalTest()
+    test = FunctionalTest(verbose="--verbose" in sys.argv[1:])
     success = await test.run_all_tests()
     exit(0 if success else 1)
 
@@ -1,5 +1,7 @@
 """Helper functions for entity management and system prompt generation."""
+from collections import defaultdict
 import logging
+from operator import itemgetter
 from typing import Any, Dict
 
 from homeassistant.core import HomeAssistant
@@ -11,49 +13,72 @@ from homeassistant.components import conversation
 
 _LOGGER = logging.getLogger(__name__)
 
+# Section names for the device listing; other domains use domain.title()
+_DOMAIN_NAMES = {
+    "light": "Lights",
+    "climate": "Climate Control",
+    "switch": "Switches",
+    "fan": "Fans",
+    "cover": "Covers (Blinds, Shutters)",
+    "sensor": "Sensors",
+    "binary_sensor": "Binary Sensors",
+    "media_player": "Media Players",
+    "lock": "Locks",
+}
+
+# Rendered section heading lines for the known domains
+_DOMAIN_HEADINGS = {domain: f"**{name}:**" for domain, name in _DOMAIN_NAMES.items()}
+
 
 async def async_get_exposed_entities(hass: HomeAssistant) -> Dict[str, Dict[str, Any]]:
     """Get all entities exposed to conversation domain.
     
-    Returns a dict mapping entity_id to entity attributes including:
+    Returns a dict mapping entity_id to the fields used in the prompt:
     - friendly_name: Human-readable name
     - state: Current state
+    - unit: Unit of measurement (if any), joined to the state when formatting
     - area_name: Area the entity belongs to (if any)
     - domain: Entity domain (light, climate, etc)
     """
     entity_states: Dict[str, Dict[str, Any]] = {}
-    entity_registry = async_get_entity_registry(hass)
-    device_registry = async_get_device_registry(hass)
-    area_registry = async_get_area_registry(hass)
+    # Registry lookups are bound once; the loop below runs for every state
+    get_entity = async_get_entity_registry(hass).async_get
+    get_device = async_get_device_registry(hass).async_get
+    # Many entities share few areas, so resolve the names up front
+    area_names = {
+        area.id: area.name for area in async_get_area_registry(hass).async_list_areas()
+    }
+    assistant = conversation.DOMAIN
 
     for state in hass.states.async_all():
+        entity_id = state.entity_id
         # Check if entity is exposed to conversation
-        if not async_should_expose(hass, conversation.DOMAIN, state.entity_id):
+        if not async_should_expose(hass, assistant, entity_id):
             continue
 
         # Get entity and device info
-        entity = entity_registry.async_get(state.entity_id)
+        entity = get_entity(entity_id)
         device = None
         if entity and entity.device_id:
-            device = device_registry.async_get(entity.device_id)
-
-        # Build attributes dict
-        attributes = dict(state.attributes)
-        attributes["state"] = state.state
-        attributes["domain"] = state.domain
-
-        # Add unit of measurement to state if present
-        if entity and entity.unit_of_measurement:
-            attributes["state"] = f"{state.state} {entity.unit_of_measurement}"
+            device = get_device(entity.device_id)
 
         # Get friendly name
         if entity and entity.name:
-            attributes["friendly_name"] = entity.name
+            friendly_name = entity.name
         else:
-            attributes["friendly_name"] = state.attributes.get("friendly_name", state.entity_id)
+            friendly_name = state.attributes.get("friendly_name", entity_id)
+
+        # Only keep what the prompt shows rather than copying every state
+        # attribute; the unit is joined to the state by the formatter
+        attributes = {
+            "state": state.state,
+            "domain": state.domain,
+            "friendly_name": friendly_name,
+        }
+        if entity and entity.unit_of_measurement:
+            attributes["unit"] = entity.unit_of_measurement
 
         # Get area info (prefer device area over entity area)
-        area_name = None
         area_id = None
         
         if device and device.area_id:
@@ -61,14 +86,11 @@ async def async_get_exposed_entities(hass: HomeAssistant) -> Dict[str, Dict[str,
         elif entity and entity.area_id:
             area_id = entity.area_id
 
-        if area_id:
-            area = area_registry.async_get_area(area_id)
-            if area:
-                area_name = area.name
-                attributes["area_name"] = area_name
-                attributes["area_id"] = area_id
+        if area_id and (area_name := area_names.get(area_id)):
+            attributes["area_name"] = area_name
+            attributes["area_id"] = area_id
 
-        entity_states[state.entity_id] = attributes
+        entity_states[entity_id] = attributes
 
     return entity_states
 
@@ -81,38 +103,25 @@ def format_entities_for_prompt(entities: Dict[str, Dict[str, Any]]) -> str:
     if not entities:
         return "No devices are currently exposed to the assistant."
 
-    # Group entities by domain
-    entities_by_domain: Dict[str, list] = {}
-    for entity_id, attrs in sorted(entities.items()):
-        domain = attrs.get("domain", "unknown")
-        if domain not in entities_by_domain:
-            entities_by_domain[domain] = []
-        entities_by_domain[domain].append((entity_id, attrs))
+    # Group entities by domain, then sort each (smaller) group by entity_id
+    entities_by_domain: Dict[str, list[tuple[str, Dict[str, Any]]]] = defaultdict(list)
+    for item in entities.items():
+        entities_by_domain[item[1].get("domain", "unknown")].append(item)
 
     # Format output
-    lines = []
-    lines.append("Available Smart Home Devices:")
-    lines.append("")
-
-    domain_names = {
-        "light": "Lights",
-        "climate": "Climate Control",
-        "switch": "Switches",
-        "fan": "Fans",
-        "cover": "Covers (Blinds, Shutters)",
-        "sensor": "Sensors",
-        "binary_sensor": "Binary Sensors",
-        "media_player": "Media Players",
-        "lock": "Locks",
-    }
+    lines: list[str] = ["Available Smart Home Devices:", ""]
 
-    for domain in sorted(entities_by_domain.keys()):
-        domain_display = domain_names.get(domain, domain.title())
-        lines.append(f"**{domain_display}:**")
+    for domain in sorted(entities_by_domain):
+        heading = _DOMAIN_HEADINGS.get(domain)
+        lines.append(heading or f"**{domain.title()}:**")
         
-        for entity_id, attrs in entities_by_domain[domain]:
+        group = entities_by_domain[domain]
+        group.sort(key=itemgetter(0))
+        for entity_id, attrs in group:
             friendly_name = attrs.get("friendly_name", entity_id)
             state = attrs.get("state", "unknown")
+            if unit := attrs.get("unit"):
+                state = f"{state} {unit}"
             area = attrs.get("area_name")
             
             if area:
@@ -1,113 +1,8 @@
 """Test gemma3-tools format detection and conversion."""
-import json
-
-
-def _is_gemma3_tool_format(response: dict) -> bool:
-    """Detect if response is in gemma3-tools format."""
-    if not isinstance(response, dict):
-        return False
-    
-    if "tool_calls" in response:
-        return False
-    
-    has_type_field = "type" in response
-    
-    if not has_type_field:
-        return False
-    
-    type_val = response.get("type")
-    if not isinstance(type_val, str):
-        return False
-    
-    for key in response.keys():
-        if key != "type" and ("." in key or key in ["on", "off", "brightness"]):
-            return True
-    
-    return False
-
-
-def _parse_gemma3_tool_format(response: dict, domain_map: dict = None) -> list:
-    """Parse gemma3-tools format and convert to standard tool_calls format."""
-    tool_calls = []
-    domain = response.get("type", "unknown")
-    
-    for key, value in response.items():
-        if key == "type":
-            continue
-        
-        if key in ["__reasoning__", "text"]:
-            continue
-        
-        entity_id = key if "." in key else f"{domain}.{key}"
-        
-        if isinstance(value, str):
-            action = value.lower()
-            
-            if domain == "light":
-                if action == "on":
-                    tool_call = {
-                        "function": {
-                            "name": "light_turn_on",
-                            "arguments": {"entity_id": entity_id}
-                        }
-                    }
-                elif action == "off":
-                    tool_call = {
-                        "function": {
-                            "name": "light_turn_off",
-                            "arguments": {"entity_id": entity_id}
-                        }
-                    }
-                else:
-                    continue
-                    
-            elif domain == "climate":
-                try:
-                    temp = float(value)
-                    tool_call = {
-                        "function": {
-                            "name": "climate_set_temperature",
-                            "arguments": {"entity_id": entity_id, "temperature": temp}
-                        }
-                    }
-                except (ValueError, TypeError):
-                    continue
-            else:
-                continue
-                
-        elif isinstance(value, dict):
-            if domain == "light":
-                tool_call = {
-                    "function": {
-                        "name": "light_turn_on",
-                        "arguments": {
-                            "entity_id": entity_id,
-                            **value
-                        }
-                    }
-                }
-            elif domain == "climate":
-                if "temperature" in value:
-                    tool_call = {
-                        "function": {
-                            "name": "climate_set_temperature",
-                            "arguments": {
-                                "entity_id": entity_id,
-                                "temperature": value["temperature"]
-                            }
-                        }
-                    }
-                else:
-                    continue
-            else:
-                continue
-        else:
-            continue
-        
-        if "tool_call" in locals():
-            tool_calls.append(tool_call)
-    
-    return tool_calls
+from custom_components.ollama_conversation.conversation import (
+    _is_gemma3_tool_format,
+    _parse_gemma3_tool_format,
+)
 
 
 def test_gemma3_detection_single_light():
@@ -160,6 +55,12 @@ def test_plain_text_not_detected_as_gemma3():
     assert not _is_gemma3_tool_format(response), "Should not detect plain text as gemma3"
 
 
+def test_unsupported_domain_not_detected_as_gemma3():
+    """Test that a type the parser cannot handle is not detected as gemma3."""
+    response = {"type": "switch", "switch.fan": "on"}
+    assert not _is_gemma3_tool_format(response), "Should only detect supported domains"
+
+
 def test_parse_gemma3_single_light_on():
     """Test parsing single light on."""
     response = {
@@ -303,50 +204,22 @@ def test_parse_gemma3_invalid_action():
     assert len(tool_calls) == 0
 
 
-if __name__ == "__main__":
-    test_gemma3_detection_single_light()
-    print("✓ test_gemma3_detection_single_light")
-    
-    test_gemma3_detection_multiple_lights()
-    print("✓ test_gemma3_detection_multiple_lights")
-    
-    test_gemma3_detection_full_entity_id()
-    print("✓ test_gemma3_detection_full_entity_id")
-    
-    test_standard_format_not_detected_as_gemma3()
-    print("✓ test_standard_format_not_detected_as_gemma3")
-    
-    test_plain_text_not_detected_as_gemma3()
-    print("✓ test_plain_text_not_detected_as_gemma3")
-    
-    test_parse_gemma3_single_light_on()
-    print("✓ test_parse_gemma3_single_light_on")
-    
-    test_parse_gemma3_single_light_off()
-    print("✓ test_parse_gemma3_single_light_off")
-    
-    test_parse_gemma3_multiple_lights()
-    print("✓ test_parse_gemma3_multiple_lights")
-    
-    test_parse_gemma3_light_with_brightness()
-    print("✓ test_parse_gemma3_light_with_brightness")
-    
-    test_parse_gemma3_climate_temperature()
-    print("✓ test_parse_gemma3_climate_temperature")
-    
-    test_parse_gemma3_climate_with_dict()
-    print("✓ test_parse_gemma3_climate_with_dict")
-    
-    test_parse_gemma3_mixed_actions()
-    print("✓ test_parse_gemma3_mixed_actions")
-    
-    test_parse_gemma3_with_content_field()
-    print("✓ test_parse_gemma3_with_content_field")
-    
-    test_parse_gemma3_invalid_domain()
-    print("✓ test_parse_gemma3_invalid_domain")
-    
-    test_parse_gemma3_invalid_action()
-    print("✓ test_parse_gemma3_invalid_action")
+
+def test_parse_gemma3_unsupported_value_skipped():
+    """Test that values that are neither actions nor parameters are skipped."""
+    response = {
+        "type": "light",
+        "light.desk_lamp": ["on"],
+        "light.kitchen": "on"
+    }
+    tool_calls = _parse_gemma3_tool_format(response)
     
-    print("\n✅ All 15 tests passed!")
+    assert [tc["function"]["arguments"]["entity_id"] for tc in tool_calls] == ["light.kitchen"]
+
+
+if __name__ == "__main__":
+    import sys
+
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q", "-p", "no:cacheprovider"]))
@@ -1,12 +1,36 @@
 """Test suite for Ollama Conversation integration."""
+from functools import lru_cache
+from pathlib import Path
+
 import pytest
+import pytest_asyncio
 from unittest.mock import AsyncMock, Mock, patch
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
 from homeassistant.core import HomeAssistant
 from aioresponses import aioresponses
+import orjson
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 
 from custom_components.ollama_conversation import async_setup_entry, async_unload_entry, OllamaClient
-from custom_components.ollama_conversation.const import DOMAIN, CONF_MODEL, CONF_URL
+from custom_components.ollama_conversation.const import (
+    CONF_MODEL,
+    CONF_URL,
+    DOMAIN,
+    TIMEOUT_CHAT_MIN,
+)
+
+
+# /api/tags reply shared by several tests, encoded once
+_LLAMA2_TAGS_BODY = orjson.dumps({"models": [{"name": "llama2"}]})
+
+
+@lru_cache(maxsize=1)
+def _load_manifest() -> dict:
+    """Read the manifest.json next to this test file once."""
+    return orjson.loads(Path(__file__).with_name("manifest.json").read_bytes())
 
 
 @pytest.fixture
@@ -19,9 +43,12 @@ def mock_hass():
     return hass
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def mock_config_entry():
-    """Create a mock config entry."""
+    """Create a mock config entry.
+    
+    No test modifies the entry, so one instance is shared by the module.
+    """
     return ConfigEntry(
         version=1,
         minor_version=1,
@@ -40,11 +67,19 @@ def mock_config_entry():
     )
 
 
+@pytest_asyncio.fixture
+async def client(mock_hass):
+    """Create a client for the default URL and close its session afterwards."""
+    client = OllamaClient(mock_hass, "http://localhost:11434")
+    yield client
+    await client.close()
+
+
 class TestOllamaClient:
     """Test OllamaClient class."""
 
     @pytest.mark.asyncio
-    async def test_get_models_success(self, mock_hass):
+    async def test_get_models_success(self, client):
         """Test successful model retrieval."""
         with aioresponses() as m:
             m.get(
@@ -57,7 +92,6 @@ class TestOllamaClient:
                 }
             )
             
-            client = OllamaClient(mock_hass, "http://localhost:11434")
             models = await client.get_models()
             
             assert len(models) == 2
@@ -65,7 +99,7 @@ class TestOllamaClient:
             assert models[1]["name"] == "mistral"
 
     @pytest.mark.asyncio
-    async def test_chat_request(self, mock_hass):
+    async def test_chat_request(self, client):
         """Test chat request."""
         with aioresponses() as m:
             m.post(
@@ -78,14 +112,61 @@ class TestOllamaClient:
                 }
             )
             
-            client = OllamaClient(mock_hass, "http://localhost:11434")
             messages = [{"role": "user", "content": "Hello"}]
             response = await client.chat(messages, "llama2")
             
             assert response["message"]["content"] == "Hello! How can I help you?"
-    
+
+    @pytest.mark.asyncio
+    async def test_chat_timeout_scales_with_context(self, mock_hass):
+        """Test that the default chat timeout grows with the context window."""
+        small = OllamaClient(mock_hass, "http://localhost:11434", context_window=2048)
+        large = OllamaClient(mock_hass, "http://localhost:11434", context_window=32768)
+
+        try:
+            # Small windows keep the fixed floor rather than a shorter limit
+            assert small.chat_timeout == TIMEOUT_CHAT_MIN
+            assert small.chat_timeout < large.chat_timeout
+        finally:
+            await small.close()
+            await large.close()
+
+    @pytest.mark.asyncio
+    async def test_chat_large_response_decoded_in_executor(self, mock_hass, client):
+        """Test that large response bodies are decoded off the event loop."""
+        mock_hass.async_add_executor_job = AsyncMock(side_effect=lambda func, *args: func(*args))
+        content = "x" * 40_000
+
+        with aioresponses() as m:
+            m.post(
+                "http://localhost:11434/api/chat",
+                payload={"message": {"role": "assistant", "content": content}},
+            )
+
+            response = await client.chat([{"role": "user", "content": "Hello"}], "llama2")
+
+        assert response["message"]["content"] == content
+        mock_hass.async_add_executor_job.assert_awaited_once()
+
     @pytest.mark.asyncio
-    async def test_chat_with_tools(self, mock_hass):
+    async def test_chat_error_status(self, client):
+        """Test that a non-200 chat response raises with the body in the message."""
+        with aioresponses() as m:
+            m.post(
+                "http://localhost:11434/api/chat",
+                status=500,
+                body="model not found",
+            )
+
+            messages = [{"role": "user", "content": "Hello"}]
+            with pytest.raises(aiohttp.ClientResponseError) as exc_info:
+                await client.chat(messages, "llama2")
+
+            assert exc_info.value.status == 500
+            assert "model not found" in exc_info.value.message
+
+    @pytest.mark.asyncio
+    async def test_chat_with_tools(self, client):
         """Test chat request with tools."""
         with aioresponses() as m:
             m.post(
@@ -106,7 +187,6 @@ class TestOllamaClient:
                 }
             )
             
-            client = OllamaClient(mock_hass, "http://localhost:11434")
             messages = [{"role": "user", "content": "Turn on living room lights"}]
             tools = [
                 {
@@ -129,6 +209,115 @@ class TestOllamaClient:
             assert "tool_calls" in response["message"]
             assert response["message"]["tool_calls"][0]["function"]["name"] == "light_turn_on"
 
+            # The request body is sent as pre-encoded JSON bytes
+            request = next(iter(m.requests.values()))[0]
+            body = orjson.loads(request.kwargs["data"])
+            assert body["model"] == "llama2"
+            assert body["tools"] == tools
+
+    @pytest.mark.asyncio
+    async def test_chat_reuses_encoded_history(self, client):
+        """Test that replayed history messages are encoded once and sent intact."""
+        history = [
+            {"role": "user", "content": "Turn on the kitchen light"},
+            {"role": "assistant", "content": "Done."},
+        ]
+        with aioresponses() as m:
+            m.post(
+                "http://localhost:11434/api/chat",
+                payload={"message": {"role": "assistant", "content": "Sure."}},
+                repeat=True,
+            )
+
+            await client.chat([*history, {"role": "user", "content": "Hi"}], "llama2")
+            encoded = [client._message_cache[id(message)][1] for message in history]
+            messages = [*history, {"role": "user", "content": "And the hall?"}]
+            await client.chat(messages, "llama2")
+
+            request = list(m.requests.values())[0][-1]
+            assert orjson.loads(request.kwargs["data"])["messages"] == messages
+
+        # The cached bytes objects are reused rather than re-encoded
+        for message, first_encoding in zip(history, encoded):
+            assert client._message_cache[id(message)][1] is first_encoding
+
+    @pytest.mark.asyncio
+    async def test_chat_stream(self, client):
+        """Test that streamed chunks are yielded as they are decoded."""
+        ndjson = (
+            b'{"message":{"role":"assistant","content":"Hel"},"done":false}\n'
+            b'{"message":{"role":"assistant","content":"lo!"},"done":false}\n'
+            b'{"message":{"role":"assistant","content":""},"done":true,"eval_count":2}\n'
+        )
+        with aioresponses() as m:
+            m.post("http://localhost:11434/api/chat", body=ndjson)
+
+            messages = [{"role": "user", "content": "Hello"}]
+            deltas = [
+                chunk["message"]["content"]
+                async for chunk in client.chat_stream(messages, "llama2")
+            ]
+
+            request = next(iter(m.requests.values()))[0]
+            assert orjson.loads(request.kwargs["data"])["stream"] is True
+
+        assert deltas == ["Hel", "lo!", ""]
+
+    @pytest.mark.asyncio
+    async def test_chat_streamed_response_is_assembled(self, client):
+        """Test that chat(stream=True) returns the same shape as a full response."""
+        ndjson = (
+            b'{"message":{"role":"assistant","content":"Turning on"},"done":false}\n'
+            b'{"message":{"role":"assistant","content":"","tool_calls":[{"function":'
+            b'{"name":"light_turn_on","arguments":{"entity_id":"light.kitchen"}}}]},"done":false}\n'
+            b'{"message":{"role":"assistant","content":"."},"done":true}\n'
+        )
+        with aioresponses() as m:
+            m.post("http://localhost:11434/api/chat", body=ndjson)
+
+            messages = [{"role": "user", "content": "Kitchen light on"}]
+            response = await client.chat(messages, "llama2", stream=True)
+
+        assert response["done"] is True
+        assert response["message"]["content"] == "Turning on."
+        assert response["message"]["tool_calls"][0]["function"]["name"] == "light_turn_on"
+
+    @pytest.mark.asyncio
+    async def test_round_trip_against_http_server(self, mock_hass):
+        """Test the client against a real HTTP server rather than mocks."""
+        ndjson = (
+            b'{"message":{"role":"assistant","content":"Hi"},"done":false}\n'
+            b'{"message":{"role":"assistant","content":"!"},"done":true}\n'
+        )
+        received = []
+
+        async def handle_tags(request):
+            return web.Response(body=_LLAMA2_TAGS_BODY, content_type="application/json")
+
+        async def handle_chat(request):
+            received.append(orjson.loads(await request.read()))
+            return web.Response(body=ndjson, content_type="application/x-ndjson")
+
+        app = web.Application()
+        app.router.add_get("/api/tags", handle_tags)
+        app.router.add_post("/api/chat", handle_chat)
+
+        async with TestServer(app) as server:
+            client = OllamaClient(mock_hass, str(server.make_url("/")))
+            messages = [{"role": "user", "content": "Hello"}]
+            tools = [{"type": "function", "function": {"name": "light_turn_on"}}]
+            try:
+                models = await client.get_models()
+                response = await client.chat(messages, "llama2", tools=tools, stream=True)
+            finally:
+                await client.close()
+
+        assert models == [{"name": "llama2"}]
+        assert response["message"]["content"] == "Hi!"
+        assert received[0]["messages"] == messages
+        assert received[0]["tools"] == tools
+        assert received[0]["stream"] is True
+
 
 class TestIntegrationSetup:
     """Test integration setup."""
@@ -139,7 +328,7 @@ class TestIntegrationSetup:
         with aioresponses() as m:
             m.get(
                 "http://localhost:11434/api/tags",
-                payload={"models": [{"name": "llama2"}]}
+                body=_LLAMA2_TAGS_BODY
             )
             
             mock_hass.config_entries = Mock()
@@ -151,10 +340,19 @@ class TestIntegrationSetup:
             assert DOMAIN in mock_hass.data
             assert mock_config_entry.entry_id in mock_hass.data[DOMAIN]
 
+        # The client's session is closed when Home Assistant shuts down
+        client = mock_hass.data[DOMAIN][mock_config_entry.entry_id]
+        event_type, close_client = mock_hass.bus.async_listen_once.call_args.args
+        assert event_type == EVENT_HOMEASSISTANT_CLOSE
+        await close_client(Mock())
+        assert client.session.closed
+
     @pytest.mark.asyncio
     async def test_async_unload_entry(self, mock_hass, mock_config_entry):
         """Test successful unload."""
-        mock_hass.data[DOMAIN] = {mock_config_entry.entry_id: Mock()}
+        client = Mock()
+        client.close = AsyncMock()
+        mock_hass.data[DOMAIN] = {mock_config_entry.entry_id: client}
         mock_hass.config_entries = Mock()
         mock_hass.config_entries.async_unload_platforms = AsyncMock(return_value=True)
         
@@ -162,47 +360,41 @@ class TestIntegrationSetup:
         
         assert result is True
         assert mock_config_entry.entry_id not in mock_hass.data[DOMAIN]
+        client.close.assert_awaited_once()
+
+
+@pytest.fixture(scope="module")
+def conversation_mod():
+    """Import HA's conversation component once, skipping if unavailable."""
+    return pytest.importorskip("homeassistant.components.conversation")
+
+
+@pytest.fixture(scope="module")
+def entity_cls(conversation_mod):
+    """Import the conversation entity class once per module."""
+    module = pytest.importorskip("custom_components.ollama_conversation.conversation")
+    return module.OllamaConversationEntity
 
 
 class TestConversationEntity:
     """Test OllamaConversationEntity."""
     
-    def test_supported_features(self, mock_hass, mock_config_entry):
+    def test_supported_features(self, mock_hass, mock_config_entry, conversation_mod, entity_cls):
         """Test that entity declares CONTROL feature."""
-        from custom_components.ollama_conversation.conversation import OllamaConversationEntity
-        
-        # Import locally to avoid top-level import issues
-        try:
-            from homeassistant.components import conversation
-            entity = OllamaConversationEntity(mock_hass, mock_config_entry)
-            assert entity.supported_features == conversation.ConversationEntityFeature.CONTROL
-        except ImportError:
-            pytest.skip("conversation module dependencies not available")
+        entity = entity_cls(mock_hass, mock_config_entry)
+        assert entity.supported_features == conversation_mod.ConversationEntityFeature.CONTROL
     
-    def test_entity_properties(self, mock_hass, mock_config_entry):
+    def test_entity_properties(self, mock_hass, mock_config_entry, entity_cls):
         """Test entity properties are set correctly."""
-        from custom_components.ollama_conversation.conversation import OllamaConversationEntity
-        
-        try:
-            entity = OllamaConversationEntity(mock_hass, mock_config_entry)
-            assert entity._attr_unique_id == mock_config_entry.entry_id
-            assert entity._attr_device_info["model"] == "llama2"
-            assert entity._attr_has_entity_name is True
-        except ImportError:
-            pytest.skip("conversation module dependencies not available")
+        entity = entity_cls(mock_hass, mock_config_entry)
+        assert entity._attr_unique_id == mock_config_entry.entry_id
+        assert entity._attr_device_info["model"] == "llama2"
+        assert entity._attr_has_entity_name is True
 
 
 def test_manifest_structure():
     """Test that manifest.json has required structure."""
-    import json
-    import os
-    
-    # Get the path to manifest.json relative to this test file
-    test_dir = os.path.dirname(__file__)
-    manifest_path = os.path.join(test_dir, "manifest.json")
-    
-    with open(manifest_path, "r") as f:
-        manifest = json.load(f)
+    manifest = _load_manifest()
     
     assert manifest["domain"] == "ollama_conversation"
     assert "version" in manifest
@@ -53,6 +53,12 @@ class TestMarkdownJsonExtraction:
         assert result["type"] == "light"
         assert result["entity_id"] == "light.bedroom"
 
+    def test_extract_json_direct_json_with_fence_in_string(self):
+        """Test that a bare JSON object is returned whole, not a fence inside it."""
+        content = '{"type": "light", "text": "```{\\"x\\": 1}```"}'
+        result = _extract_json_from_markdown(content)
+        assert result == {"type": "light", "text": '```{"x": 1}```'}
+
     def test_extract_json_invalid_json(self):
         """Test handling of invalid JSON."""
         content = """```json
@@ -185,6 +191,16 @@ class TestMarkdownGemma3Integration:
         """Test that non-gemma3 JSON in markdown is not detected as gemma3."""
         content = """```json
 {"some_other": "format", "not": "gemma3"}
+```"""
+        
+        json_data = _extract_json_from_markdown(content)
+        assert json_data is not None
+        assert _is_gemma3_tool_format(json_data) is False
+
+    def test_markdown_unknown_domain_not_gemma3(self):
+        """Test that a type the parser cannot act on is not detected as gemma3."""
+        content = """```json
+{"type": "vacuum", "vacuum.downstairs": "on"}
 ```"""
         
         json_data = _extract_json_from_markdown(content)
@@ -1,5 +1,8 @@
 """Tests for Phase 1: Entity Context Implementation"""
+import asyncio
+
 import pytest
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 from homeassistant.components.conversation import ConversationInput, ConversationResult
 from custom_components.ollama_conversation.conversation import OllamaConversationEntity
@@ -11,12 +14,15 @@ from custom_components.ollama_conversation.helpers import (
 
 @pytest.fixture
 def mock_hass():
-    """Create a mock Home Assistant instance."""
-    hass = MagicMock()
-    hass.data = {}
-    hass.states = MagicMock()
-    hass.services = MagicMock()
-    return hass
+    """Create a mock Home Assistant instance.
+    
+    The agent only touches data, bus, states and services in these tests,
+    so hass itself is a plain namespace; those members stay mocks for the
+    tests that configure or assert on them.
+    """
+    return SimpleNamespace(
+        data={}, bus=MagicMock(), states=MagicMock(), services=MagicMock()
+    )
 
 
 @pytest.fixture
@@ -92,6 +98,69 @@ class TestHelpers:
         assert "light.kitchen" in result
         assert "climate.bedroom" in result
 
+    def test_format_entities_for_prompt_order(self):
+        """Test that domains and the entities within them are listed in order."""
+        entities = {
+            "light.b": {"domain": "light", "state": "on"},
+            "climate.x": {"domain": "climate", "state": "20", "unit": "°C"},
+            "light.a": {"domain": "light", "state": "off"},
+        }
+
+        lines = format_entities_for_prompt(entities).splitlines()
+
+        assert [line for line in lines if line.startswith(("**", "  -"))] == [
+            "**Climate Control:**",
+            "  - climate.x (climate.x): 20 °C",
+            "**Lights:**",
+            "  - light.a (light.a): off",
+            "  - light.b (light.b): on",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_exposed_entities_keep_prompt_fields(self, mock_hass):
+        """Test that exposed entities carry only the fields the prompt uses."""
+        lamp = MagicMock(
+            entity_id="light.lamp", domain="light", state="on",
+            attributes={"friendly_name": "Lamp", "brightness": 255},
+        )
+        hidden = MagicMock(entity_id="switch.secret", domain="switch", state="off", attributes={})
+        mock_hass.states.async_all.return_value = [lamp, hidden]
+        registry_entry = MagicMock(device_id="dev1", area_id=None, unit_of_measurement=None)
+        registry_entry.name = None
+        entity_registry = MagicMock()
+        entity_registry.async_get.return_value = registry_entry
+        device_registry = MagicMock()
+        device_registry.async_get.return_value = MagicMock(area_id="office")
+        area_registry = MagicMock()
+        area = MagicMock(id="office")
+        area.name = "Office"
+        area_registry.async_list_areas.return_value = [area]
+
+        with patch(
+            "custom_components.ollama_conversation.helpers.async_should_expose",
+            side_effect=lambda hass, assistant, entity_id: entity_id == "light.lamp",
+        ), patch(
+            "custom_components.ollama_conversation.helpers.async_get_entity_registry",
+            return_value=entity_registry,
+        ), patch(
+            "custom_components.ollama_conversation.helpers.async_get_device_registry",
+            return_value=device_registry,
+        ), patch(
+            "custom_components.ollama_conversation.helpers.async_get_area_registry",
+            return_value=area_registry,
+        ):
+            entities = await async_get_exposed_entities(mock_hass)
+
+        assert entities == {
+            "light.lamp": {
+                "state": "on",
+                "domain": "light",
+                "friendly_name": "Lamp",
+                "area_name": "Office",
+                "area_id": "office",
+            },
+        }
+
 
 class TestSystemPrompt:
     """Test system prompt generation."""
@@ -140,10 +209,107 @@ class TestSystemPrompt:
             assert "find the matching entity_id" in prompt
             assert "ask the user for clarification" in prompt
 
+    @pytest.mark.asyncio
+    async def test_system_prompt_rebuilt_only_on_entity_change(self, mock_hass, mock_config_entry):
+        """Test that the prompt is reused until an exposed entity changes."""
+        entities = {
+            "light.kitchen": {
+                "friendly_name": "Kitchen Light",
+                "state": "off",
+                "domain": "light",
+            },
+        }
+        with patch(
+            "custom_components.ollama_conversation.conversation.async_get_exposed_entities",
+            AsyncMock(side_effect=lambda hass: {k: dict(v) for k, v in entities.items()}),
+        ), patch(
+            "custom_components.ollama_conversation.conversation.format_entities_for_prompt",
+            wraps=format_entities_for_prompt,
+        ) as mock_format:
+            entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+            first = await entity._get_system_message()
+            second = await entity._get_system_message()
+            
+            assert second is first
+            assert mock_format.call_count == 1
+            
+            entities["light.kitchen"]["state"] = "on"
+            third = await entity._get_system_message()
+            
+            assert third is not first
+            assert "light.kitchen (Kitchen Light): on" in third["content"]
+            assert mock_format.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_entities_recollected_only_after_change(self, mock_hass, mock_config_entry):
+        """Test that listeners let unchanged turns skip collecting entities."""
+        with patch(
+            "custom_components.ollama_conversation.conversation.async_get_exposed_entities",
+            AsyncMock(return_value={"light.kitchen": {"state": "off", "domain": "light"}}),
+        ) as mock_get_entities, patch(
+            "custom_components.ollama_conversation.conversation.async_listen_entity_updates"
+        ):
+            entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+            entity.async_on_remove = MagicMock()
+            await entity.async_added_to_hass()
+            listeners = {
+                call.args[0]: call.args[1] for call in mock_hass.bus.async_listen.call_args_list
+            }
+
+            await entity._build_system_prompt()
+            await entity._build_system_prompt()
+            assert mock_get_entities.await_count == 1
+
+            # Unrelated entities changing state do not invalidate the prompt
+            listeners["state_changed"](MagicMock(data={
+                "entity_id": "sensor.power", "old_state": MagicMock(), "new_state": MagicMock(),
+            }))
+            await entity._build_system_prompt()
+            assert mock_get_entities.await_count == 1
+
+            listeners["state_changed"](MagicMock(data={
+                "entity_id": "light.kitchen", "old_state": MagicMock(), "new_state": MagicMock(),
+            }))
+            await entity._build_system_prompt()
+            assert mock_get_entities.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_tool_mode_prompt_is_fixed(self, mock_hass, mock_config_entry):
+        """Test that tool mode points at the lookup tool and skips the listeners."""
+        mock_config_entry.data["entity_mode"] = "tool"
+        with patch(
+            "custom_components.ollama_conversation.conversation.async_get_exposed_entities"
+        ) as mock_get_entities, patch(
+            "custom_components.ollama_conversation.conversation.async_listen_entity_updates"
+        ) as mock_listen_updates:
+            entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+            entity.async_on_remove = MagicMock()
+            await entity.async_added_to_hass()
+            prompt = await entity._build_system_prompt()
+
+        assert "call get_exposed_entities FIRST" in prompt
+        assert "above" not in prompt
+        mock_get_entities.assert_not_called()
+        mock_hass.bus.async_listen.assert_not_called()
+        mock_listen_updates.assert_not_called()
+
 
 class TestToolExecution:
     """Test tool execution with validation."""
 
+    def test_tools_schema_is_shared(self, mock_hass, mock_config_entry):
+        """Test that the static tool schema is not rebuilt per call."""
+        entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+
+        tools = entity._get_ha_tools()
+
+        assert tools is entity._get_ha_tools()
+        assert [tool["function"]["name"] for tool in tools] == [
+            "light_turn_on",
+            "light_turn_off",
+            "climate_set_temperature",
+        ]
+
     @pytest.mark.asyncio
     async def test_execute_light_turn_on_success(self, mock_hass, mock_config_entry):
         """Test successful light turn on."""
@@ -252,6 +418,61 @@ class TestToolExecution:
         assert "Error" in result
         assert "requires entity_id and temperature" in result
 
+    @pytest.mark.asyncio
+    async def test_execute_unknown_function(self, mock_hass, mock_config_entry):
+        """Test that an unknown tool name is reported without a service call."""
+        mock_hass.services.async_call = AsyncMock()
+        entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+
+        tool_call = {
+            "function": {
+                "name": "lock_unlock",
+                "arguments": {"entity_id": "lock.front_door"},
+            }
+        }
+
+        result = await entity._execute_tool_call(tool_call)
+
+        assert result == "Unknown function: lock_unlock"
+        mock_hass.services.async_call.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_execute_drops_unknown_arguments(self, mock_hass, mock_config_entry):
+        """Test that only schema arguments are forwarded to the service."""
+        mock_hass.services.async_call = AsyncMock()
+        entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+
+        tool_call = {
+            "function": {
+                "name": "light_turn_off",
+                "arguments": {"entity_id": "light.bedroom", "transition": 5},
+            }
+        }
+
+        await entity._execute_tool_call(tool_call)
+
+        mock_hass.services.async_call.assert_awaited_once_with(
+            "light", "turn_off", {"entity_id": "light.bedroom"}, blocking=True
+        )
+
+    @pytest.mark.asyncio
+    async def test_execute_parses_string_arguments_once(self, mock_hass, mock_config_entry):
+        """Test that JSON string arguments are parsed and stored on the call."""
+        mock_hass.services.async_call = AsyncMock()
+        entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+
+        tool_call = {
+            "function": {
+                "name": "light_turn_off",
+                "arguments": '{"entity_id": "light.hall"}',
+            }
+        }
+        bad_call = {"function": {"name": "light_turn_off", "arguments": "[1, 2"}}
+
+        assert await entity._execute_tool_call(tool_call) == "Successfully turned off light.hall"
+        assert tool_call["function"]["arguments"] == {"entity_id": "light.hall"}
+        assert await entity._execute_tool_call(bad_call) == "Error: Invalid arguments format"
+
 
 # Integration test to verify the complete flow
 @pytest.mark.asyncio
@@ -316,3 +537,442 @@ async def test_qwen3_light_control_flow(mock_hass, mock_config_entry):
         assert system_message["role"] == "system"
         assert "light.kitchen" in system_message["content"]
         assert "Kitchen Light" in system_message["content"]
+
+
+@pytest.mark.asyncio
+async def test_conversation_history_is_bounded(mock_hass, mock_config_entry):
+    """Test that history carries over between turns without the system prompt."""
+    mock_client = AsyncMock()
+    mock_client.chat = AsyncMock(
+        return_value={"message": {"role": "assistant", "content": "Okay."}}
+    )
+    mock_hass.data = {"ollama_conversation": {"test_entry_123": mock_client}}
+
+    with patch(
+        "custom_components.ollama_conversation.conversation.async_get_exposed_entities"
+    ) as mock_get_entities:
+        mock_get_entities.return_value = {}
+        entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+
+        user_input = MagicMock(text="Hello", conversation_id="conv_1", language="en")
+        for _ in range(8):
+            await entity.async_process(user_input)
+
+        messages = mock_client.chat.call_args[1]["messages"]
+
+    # One fresh system prompt, then at most MAX_HISTORY stored messages
+    assert [m["role"] for m in messages].count("system") == 1
+    assert messages[0]["role"] == "system"
+    assert len(messages) == 1 + 10 + 1
+    assert messages[-2] == {"role": "assistant", "content": "Okay."}
+    assert len(mock_hass.data["ollama_conversation_conversations"]["conv_1"]) == 10
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_run_concurrently_in_order(mock_hass, mock_config_entry):
+    """Test that multiple tool calls run together and results keep call order."""
+    running = 0
+    peak = 0
+
+    async def slow_service_call(domain, service, data, blocking):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01 if data["entity_id"] == "light.a" else 0)
+        running -= 1
+
+    mock_hass.services.async_call = slow_service_call
+    mock_client = AsyncMock()
+    mock_client.chat = AsyncMock(
+        side_effect=[
+            {
+                "message": {
+                    "role": "assistant",
+                    "content": "",
+                    "tool_calls": [
+                        {"function": {"name": "light_turn_off", "arguments": {"entity_id": "light.a"}}},
+                        {"function": {"name": "light_turn_on", "arguments": {"entity_id": "light.b"}}},
+                    ],
+                }
+            },
+            {"message": {"role": "assistant", "content": "Done."}},
+        ]
+    )
+    mock_hass.data = {"ollama_conversation": {"test_entry_123": mock_client}}
+
+    with patch(
+        "custom_components.ollama_conversation.conversation.async_get_exposed_entities"
+    ) as mock_get_entities:
+        mock_get_entities.return_value = {}
+        entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+        user_input = MagicMock(text="Turn off the lights", conversation_id=None, language="en")
+        await entity.async_process(user_input)
+
+    messages = mock_client.chat.call_args[1]["messages"]
+    tool_messages = [m["content"] for m in messages if m["role"] == "tool"]
+
+    assert peak == 2
+    assert tool_messages == [
+        "Successfully turned off light.a",
+        "Successfully turned on light.b",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_same_service_tool_calls_are_batched(mock_hass, mock_config_entry):
+    """Test that calls differing only in entity_id share one service call."""
+    mock_hass.services.async_call = AsyncMock()
+    entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+
+    results = await entity._execute_tool_calls([
+        {"function": {"name": "light_turn_off", "arguments": {"entity_id": "light.a"}}},
+        {"function": {"name": "light_turn_on", "arguments": {"entity_id": "light.c", "brightness": 10}}},
+        {"function": {"name": "light_turn_off", "arguments": {"entity_id": "light.b"}}},
+        {"function": {"name": "light_turn_on", "arguments": {"entity_id": "light.d", "brightness": 200}}},
+        {"function": {"name": "light_turn_off", "arguments": {}}},
+    ])
+
+    assert results == [
+        "Successfully turned off light.a",
+        "Successfully turned on light.c to 10 brightness",
+        "Successfully turned off light.b",
+        "Successfully turned on light.d to 200 brightness",
+        "Error: light_turn_off requires entity_id parameter",
+    ]
+    calls = [call.args for call in mock_hass.services.async_call.await_args_list]
+    assert len(calls) == 3
+    assert ("light", "turn_off", {"entity_id": ["light.a", "light.b"]}) in calls
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_concurrency_is_bounded(mock_hass, mock_config_entry):
+    """Test that concurrent service calls are capped by the tool semaphore."""
+    running = 0
+    peak = 0
+
+    async def slow_service_call(domain, service, data, blocking):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    mock_hass.services.async_call = slow_service_call
+    entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+    entity._tool_semaphore = asyncio.Semaphore(2)
+
+    results = await asyncio.gather(
+        *(
+            entity._execute_tool_call(
+                {"function": {"name": "light_turn_off", "arguments": {"entity_id": f"light.l{i}"}}}
+            )
+            for i in range(5)
+        )
+    )
+
+    assert peak == 2
+    assert results[4] == "Successfully turned off light.l4"
+
+
+@pytest.mark.asyncio
+async def test_repeated_first_turn_reuses_reply(mock_hass, mock_config_entry):
+    """Test that an identical new request skips the first model call but reruns tools."""
+    mock_hass.services.async_call = AsyncMock()
+    mock_client = AsyncMock()
+    mock_client.chat = AsyncMock(
+        side_effect=[
+            {
+                "message": {
+                    "role": "assistant",
+                    "content": "",
+                    "tool_calls": [
+                        {"function": {"name": "light_turn_off", "arguments": {"entity_id": "light.kitchen"}}},
+                    ],
+                }
+            },
+            {"message": {"role": "assistant", "content": "The kitchen light is off."}},
+            {"message": {"role": "assistant", "content": "It's off again."}},
+        ]
+    )
+    mock_hass.data = {"ollama_conversation": {"test_entry_123": mock_client}}
+
+    with patch(
+        "custom_components.ollama_conversation.conversation.async_get_exposed_entities"
+    ) as mock_get_entities:
+        mock_get_entities.return_value = {}
+        entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+        await entity.async_process(
+            MagicMock(text="Turn off the kitchen light", conversation_id=None, language="en")
+        )
+        result = await entity.async_process(
+            MagicMock(text="turn off the  kitchen light ", conversation_id=None, language="en")
+        )
+
+    assert mock_client.chat.await_count == 3
+    assert mock_hass.services.async_call.await_count == 2
+    assert result.response.speech["plain"]["speech"] == "It's off again."
+    # Entries are keyed by a digest of the prompt, not a copy of it
+    (key,) = entity._response_cache
+    assert key == (hash(entity._system_message["content"]), "turn off the kitchen light")
+
+
+@pytest.mark.asyncio
+async def test_streamed_tool_calls_start_before_reply_completes(mock_hass, mock_config_entry):
+    """Test that tool calls run as soon as their chunk arrives."""
+    service_called = asyncio.Event()
+    mock_hass.services.async_call = AsyncMock(side_effect=lambda *args, **kwargs: service_called.set())
+    tool_call = {"function": {"name": "light_turn_off", "arguments": {"entity_id": "light.kitchen"}}}
+
+    async def fake_chat(messages, model, tools=None, temperature=0.7, stream=False, on_chunk=None):
+        if on_chunk is None:
+            return {"message": {"role": "assistant", "content": "The kitchen light is off."}}
+        on_chunk({"message": {"role": "assistant", "content": "", "tool_calls": [tool_call]}, "done": False})
+        # The service call happens before the stream finishes
+        await asyncio.wait_for(service_called.wait(), 1)
+        return {"message": {"role": "assistant", "content": "", "tool_calls": [tool_call]}, "done": True}
+
+    mock_client = MagicMock()
+    mock_client.chat = fake_chat
+    mock_hass.data = {"ollama_conversation": {"test_entry_123": mock_client}}
+
+    with patch(
+        "custom_components.ollama_conversation.conversation.async_get_exposed_entities"
+    ) as mock_get_entities:
+        mock_get_entities.return_value = {}
+        entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+        result = await entity.async_process(
+            MagicMock(text="Turn off the kitchen light", conversation_id=None, language="en")
+        )
+
+    mock_hass.services.async_call.assert_awaited_once()
+    assert result.response.speech["plain"]["speech"] == "The kitchen light is off."
+
+
+@pytest.mark.asyncio
+async def test_streamed_tool_calls_cancelled_when_stream_fails(mock_hass, mock_config_entry):
+    """Test that tool calls started mid-stream are not left running after an error."""
+    service_started = asyncio.Event()
+    service_cancelled = asyncio.Event()
+
+    async def slow_service(*args, **kwargs):
+        service_started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            service_cancelled.set()
+            raise
+
+    mock_hass.services.async_call = slow_service
+    tool_call = {"function": {"name": "light_turn_off", "arguments": {"entity_id": "light.kitchen"}}}
+
+    async def fake_chat(messages, model, tools=None, temperature=0.7, stream=False, on_chunk=None):
+        on_chunk({"message": {"role": "assistant", "content": "", "tool_calls": [tool_call]}, "done": False})
+        await asyncio.wait_for(service_started.wait(), 1)
+        raise ConnectionError("stream dropped")
+
+    mock_client = MagicMock()
+    mock_client.chat = fake_chat
+    mock_hass.data = {"ollama_conversation": {"test_entry_123": mock_client}}
+
+    with patch(
+        "custom_components.ollama_conversation.conversation.async_get_exposed_entities"
+    ) as mock_get_entities:
+        mock_get_entities.return_value = {}
+        entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+        result = await entity.async_process(
+            MagicMock(text="Turn off the kitchen light", conversation_id=None, language="en")
+        )
+
+    assert result.response.error_code is not None
+    assert "stream dropped" in result.response.speech["plain"]["speech"]
+    assert service_cancelled.is_set()
+    current = asyncio.current_task()
+    assert all(task.done() for task in asyncio.all_tasks() if task is not current)
+
+
+def test_history_trimmed_to_character_budget():
+    """Test that the oldest history is dropped to fit the context budget."""
+    from collections import deque
+    from custom_components.ollama_conversation.conversation import (
+        _trim_orphaned_tool_messages,
+    )
+
+    history = deque([
+        {"role": "user", "content": "a" * 40},
+        {"role": "assistant", "content": "b" * 40},
+        {"role": "tool", "content": "c" * 10},
+        {"role": "user", "content": "d" * 20},
+        {"role": "assistant", "content": "e" * 20},
+    ])
+
+    assert _trim_orphaned_tool_messages(history) == list(history)
+    # The tool result fits but is dropped because its call was trimmed
+    assert [m["content"][0] for m in _trim_orphaned_tool_messages(history, 55)] == ["d", "e"]
+    assert _trim_orphaned_tool_messages(history, 10) == []
+
+
+def test_gemma3_unparsable_value_does_not_repeat_previous_call():
+    """Test that an unsupported value does not re-append the previous tool call."""
+    from custom_components.ollama_conversation.conversation import (
+        _parse_gemma3_tool_format,
+    )
+
+    tool_calls = _parse_gemma3_tool_format({
+        "type": "light",
+        "light.desk_lamp": "on",
+        "light.kitchen": 42,
+    })
+
+    assert tool_calls == [
+        {"function": {"name": "light_turn_on", "arguments": {"entity_id": "light.desk_lamp"}}},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_empty_reply_after_tools_is_summarized(mock_hass, mock_config_entry):
+    """Test the fallback confirmation when the final reply is only a think block."""
+    mock_hass.services.async_call = AsyncMock()
+    mock_client = AsyncMock()
+    mock_client.chat = AsyncMock(
+        side_effect=[
+            {
+                "message": {
+                    "role": "assistant",
+                    "content": "",
+                    "tool_calls": [
+                        {"function": {"name": "light_turn_on", "arguments": '{"entity_id": "light.a", "brightness": 90}'}},
+                        {"function": {"name": "climate_set_temperature", "arguments": {"entity_id": "climate.b", "temperature": 21}}},
+                    ],
+                }
+            },
+            {"message": {"role": "assistant", "content": "<think>done</think>"}},
+        ]
+    )
+    mock_hass.data = {"ollama_conversation": {"test_entry_123": mock_client}}
+
+    with patch(
+        "custom_components.ollama_conversation.conversation.async_get_exposed_entities"
+    ) as mock_get_entities:
+        mock_get_entities.return_value = {}
+        entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+        result = await entity.async_process(
+            MagicMock(text="Dim the light and warm the room", conversation_id=None, language="en")
+        )
+
+    assert result.response.speech["plain"]["speech"] == (
+        "Done! I've turned on light.a to 90 brightness, and set climate.b to 21°."
+    )
+
+
+@pytest.mark.asyncio
+async def test_history_length_follows_config(mock_hass, mock_config_entry):
+    """Test that the configured number of history messages is kept."""
+    mock_config_entry.data["max_history"] = 2
+    mock_client = AsyncMock()
+    mock_client.chat = AsyncMock(
+        side_effect=[
+            {"message": {"role": "assistant", "content": "Hi"}},
+            {"message": {"role": "assistant", "content": "Fine"}},
+        ]
+    )
+    mock_hass.data = {"ollama_conversation": {"test_entry_123": mock_client}}
+
+    with patch(
+        "custom_components.ollama_conversation.conversation.async_get_exposed_entities"
+    ) as mock_get_entities:
+        mock_get_entities.return_value = {}
+        entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+        for text in ("Hello", "How are you?"):
+            await entity.async_process(
+                MagicMock(text=text, conversation_id="conv_1", language="en")
+            )
+
+    assert list(entity._conv_store["conv_1"]) == [
+        {"role": "user", "content": "How are you?"},
+        {"role": "assistant", "content": "Fine"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_tool_mode_looks_up_devices_then_acts(mock_hass, mock_config_entry):
+    """Test that tool mode keeps devices out of the prompt and serves lookups."""
+    mock_config_entry.data["entity_mode"] = "tool"
+    mock_hass.services.async_call = AsyncMock()
+    mock_client = AsyncMock()
+    mock_client.chat = AsyncMock(
+        side_effect=[
+            {"message": {"role": "assistant", "content": "", "tool_calls": [
+                {"function": {"name": "get_exposed_entities", "arguments": {"domain": "light"}}},
+            ]}},
+            {"message": {"role": "assistant", "content": "", "tool_calls": [
+                {"function": {"name": "light_turn_on", "arguments": {"entity_id": "light.kitchen"}}},
+            ]}},
+            {"message": {"role": "assistant", "content": "The kitchen light is on."}},
+        ]
+    )
+    mock_hass.data = {"ollama_conversation": {"test_entry_123": mock_client}}
+
+    with patch(
+        "custom_components.ollama_conversation.conversation.async_get_exposed_entities"
+    ) as mock_get_entities:
+        mock_get_entities.return_value = {
+            "light.kitchen": {"domain": "light", "friendly_name": "Kitchen", "state": "off"},
+            "climate.bedroom": {"domain": "climate", "friendly_name": "Bedroom", "state": "20"},
+        }
+        entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+        result = await entity.async_process(
+            MagicMock(text="Turn on the kitchen light", conversation_id=None, language="en")
+        )
+
+    assert result.response.speech["plain"]["speech"] == "The kitchen light is on."
+    first, second, final = (call.kwargs for call in mock_client.chat.call_args_list)
+    assert "(Kitchen)" not in first["messages"][0]["content"]
+    assert first["tools"][-1]["function"]["name"] == "get_exposed_entities"
+    # The same messages list is passed on every call
+    listing = next(m["content"] for m in final["messages"] if m["role"] == "tool")
+    assert "light.kitchen (Kitchen): off" in listing
+    assert "climate.bedroom" not in listing
+    assert second["tools"] is first["tools"]
+    assert final.get("tools") is None
+    mock_hass.services.async_call.assert_awaited_once_with(
+        "light", "turn_on", {"entity_id": "light.kitchen"}, blocking=True
+    )
+
+
+@pytest.mark.asyncio
+async def test_tool_mode_turn_is_not_replayed_from_cache(mock_hass, mock_config_entry):
+    """Test that a repeated tool-mode request runs its actions exactly once per turn."""
+    mock_config_entry.data["entity_mode"] = "tool"
+    mock_hass.services.async_call = AsyncMock()
+    turn = [
+        {"message": {"role": "assistant", "content": "", "tool_calls": [
+            {"function": {"name": "get_exposed_entities", "arguments": {"domain": "light"}}},
+        ]}},
+        {"message": {"role": "assistant", "content": "", "tool_calls": [
+            {"function": {"name": "light_turn_on", "arguments": {"entity_id": "light.kitchen"}}},
+        ]}},
+        {"message": {"role": "assistant", "content": "The kitchen light is on."}},
+    ]
+    mock_client = AsyncMock()
+    mock_client.chat = AsyncMock(side_effect=[*turn, *turn])
+    mock_hass.data = {"ollama_conversation": {"test_entry_123": mock_client}}
+
+    with patch(
+        "custom_components.ollama_conversation.conversation.async_get_exposed_entities"
+    ) as mock_get_entities:
+        mock_get_entities.return_value = {
+            "light.kitchen": {"domain": "light", "friendly_name": "Kitchen", "state": "off"},
+        }
+        entity = OllamaConversationEntity(mock_hass, mock_config_entry)
+        for _ in range(2):
+            await entity.async_process(
+                MagicMock(text="Turn on the kitchen light", conversation_id=None, language="en")
+            )
+            mock_hass.services.async_call.assert_awaited_once_with(
+                "light", "turn_on", {"entity_id": "light.kitchen"}, blocking=True
+            )
+            mock_hass.services.async_call.reset_mock()
+
+    # Both turns went to the model; nothing was served from the response cache
+    assert mock_client.chat.await_count == 6
+    assert not entity._response_cache